@@ -0,0 +1,254 @@
+import cProfile
+import gzip
+import os
+import threading
+import time
+
+import brotli
+from django.conf import settings
+from django.db import connection
+from django.utils.cache import patch_vary_headers
+from pois.limits import service_unavailable
+from pois.timing import finish_request, increment, record, server_timing, start_request
+
+
+def accepted_encodings(header: str) -> set:
+    """
+    Parse the encodings that a client accepts from its Accept-Encoding header.
+    """
+    encodings = set()
+    for part in header.split(","):
+        encoding, _, params = part.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if encoding and quality > 0:
+            encodings.add(encoding.lower())
+    return encodings
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with brotli or gzip, depending on what the client accepts.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        if (
+            not settings.RESPONSE_COMPRESSION
+            or response.streaming
+            or response.has_header("Content-Encoding")
+        ):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encodings = accepted_encodings(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if "br" not in encodings and "gzip" not in encodings:
+            return response
+
+        # The compressed representation is not byte-identical anymore.
+        # The ETag is weakened whenever the client accepts compression, not only if the response was compressed,
+        # so that a 304 Not Modified carries the same ETag as the 200 it stands for.
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+
+        if response.status_code == 304 or len(response.content) < settings.RESPONSE_COMPRESSION_MIN_LENGTH:
+            return response
+
+        if "br" in encodings:
+            encoding = "br"
+            content = brotli.compress(response.content, quality=settings.BROTLI_QUALITY)
+        else:
+            encoding = "gzip"
+            content = gzip.compress(response.content, compresslevel=settings.GZIP_LEVEL)
+
+        # Only use the compressed content if it is actually shorter
+        if len(content) >= len(response.content):
+            return response
+
+        response.content = content
+        response["Content-Length"] = str(len(content))
+        response["Content-Encoding"] = encoding
+        return response
+
+
+def queue_time(request):
+    """
+    Get how long a request waited in front of the workers, in seconds, from the X-Request-Start header of the proxy.
+    Returns None if the header is missing or invalid.
+    """
+    header = request.META.get("HTTP_X_REQUEST_START", "")
+    try:
+        start = float(header[2:] if header.startswith("t=") else header)
+    except ValueError:
+        return None
+    # Proxies send seconds, milliseconds or microseconds since the epoch
+    if start > 1e14:
+        start /= 1e6
+    elif start > 1e11:
+        start /= 1e3
+    return max(0.0, time.time() - start)
+
+
+class AdmissionControlMiddleware:
+    """
+    Shed match requests with 503 and Retry-After, instead of letting them queue up.
+    Gunicorn never hands a worker more requests than it has threads, so requests queue in front of the workers.
+    Requests that already waited longer than MAX_QUEUE_TIME there are shed.
+    The number of requests in flight is bounded as well, for workers that take more requests, like the asgi worker.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.in_flight = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, request):
+        if not request.path_info.startswith("/pois/"):
+            return self.get_response(request)
+
+        waited = queue_time(request)
+        if settings.MAX_QUEUE_TIME > 0 and waited is not None and waited > settings.MAX_QUEUE_TIME:
+            increment("pois_requests_shed_total", (("reason", "queue"),))
+            return service_unavailable("Too many requests.")
+
+        limit = settings.MAX_IN_FLIGHT_REQUESTS
+        if limit <= 0:
+            return self.get_response(request)
+        with self.lock:
+            if self.in_flight >= limit:
+                increment("pois_requests_shed_total", (("reason", "in_flight"),))
+                return service_unavailable("Too many requests.")
+            self.in_flight += 1
+        try:
+            return self.get_response(request)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+class TimingMiddleware:
+    """
+    Time the stages of requests to the pois endpoints.
+    The durations are sent in a Server-Timing header and aggregated into the histograms of the metrics view.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not request.path_info.startswith("/pois/"):
+            return self.get_response(request)
+
+        start_request()
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            seconds = time.perf_counter() - start
+            spans = finish_request(endpoint_name(request), seconds)
+        if settings.SERVER_TIMING:
+            response["Server-Timing"] = server_timing(spans, seconds)
+        return response
+
+
+def endpoint_name(request) -> str:
+    """
+    Get the name of the endpoint that served a request, for logs and metrics.
+    """
+    match = getattr(request, "resolver_match", None)
+    return match.url_name if match else "unknown"
+
+
+class QueryCounter:
+    """
+    Count the database queries and their time, as an execute wrapper of the database connection.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+
+
+class QueryAccountingMiddleware:
+    """
+    Count the database queries and the database time of requests to the pois endpoints.
+    Requests with more queries than the query budget are logged, to find N+1 patterns.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not request.path_info.startswith("/pois/"):
+            return self.get_response(request)
+
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+
+        endpoint = endpoint_name(request)
+        record("db", counter.seconds)
+        increment("pois_db_queries_total", (("endpoint", endpoint),), counter.count)
+        budget = settings.QUERY_BUDGET
+        if budget > 0 and counter.count > budget:
+            increment("pois_query_budget_exceeded_total", (("endpoint", endpoint),))
+            print(
+                f"WARNING: {request.path_info} made {counter.count} queries "
+                f"({round(counter.seconds * 1000, 2)}ms), more than the budget of {budget}"
+            )
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Profile a single request with cProfile, if it carries the profiling token
+    in an X-Profile header or a profile query parameter.
+    The profile is written into the profile dump directory, to be inspected with pstats or snakeviz.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Only one profiler can be active in a process at a time
+        self.lock = threading.Lock()
+
+    def __call__(self, request):
+        token = settings.PROFILE_TOKEN
+        requested = request.META.get("HTTP_X_PROFILE") or request.GET.get("profile")
+        if not token or requested != token or not self.lock.acquire(blocking=False):
+            return self.get_response(request)
+
+        try:
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profile.disable()
+        finally:
+            self.lock.release()
+
+        os.makedirs(settings.PROFILE_DUMP_DIR, exist_ok=True)
+        name = f"{endpoint_name(request)}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.prof"
+        profile.dump_stats(os.path.join(settings.PROFILE_DUMP_DIR, name))
+        print(f"Profiled {request.path_info} into {name}")
+        response["X-Profile"] = name
+        return response
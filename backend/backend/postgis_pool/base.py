@@ -0,0 +1,148 @@
+import os
+import threading
+import time
+
+from django.contrib.gis.db.backends.postgis.base import (
+    DatabaseWrapper as PostGISDatabaseWrapper,
+)
+from django.db import OperationalError
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_UNKNOWN
+
+# The connection pools of this process, by database alias
+pools: dict = {}
+pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+    """
+    A bounded pool of database connections, shared by all threads of one worker process.
+    """
+
+    def __init__(self, size: int, timeout: float, max_age: float, health_check_after: float):
+        self.size = size
+        self.timeout = timeout
+        self.max_age = max_age
+        self.health_check_after = health_check_after
+        self.pid = os.getpid()
+        # Idle connections as (connection, created, released), the most recently used last
+        self.idle = []
+        self.created = {}
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(size)
+
+    def acquire(self, connect):
+        """
+        Take an idle connection from the pool, or open a new one with connect().
+        """
+        if not self.slots.acquire(timeout=self.timeout):
+            raise OperationalError(
+                f"No database connection available in the pool of size {self.size}"
+            )
+        try:
+            while True:
+                with self.lock:
+                    if not self.idle:
+                        break
+                    connection, created, released = self.idle.pop()
+                if self.is_healthy(connection, created, released):
+                    return connection
+                self.discard(connection)
+            connection = connect()
+            with self.lock:
+                self.created[id(connection)] = time.monotonic()
+            return connection
+        except BaseException:
+            self.slots.release()
+            raise
+
+    def release(self, connection):
+        """
+        Return a connection to the pool, resetting any open transaction.
+        """
+        with self.lock:
+            created = self.created.get(id(connection))
+        if created is None:
+            # The connection was not taken from this pool, e.g. it was inherited from a parent process
+            connection.close()
+            return
+        try:
+            status = connection.info.transaction_status if not connection.closed else None
+            if status is None or status == TRANSACTION_STATUS_UNKNOWN:
+                self.discard(connection)
+                return
+            if status != TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+            with self.lock:
+                self.idle.append((connection, created, time.monotonic()))
+        except Exception:
+            self.discard(connection)
+        finally:
+            self.slots.release()
+
+    def discard(self, connection):
+        """
+        Close a connection for good.
+        """
+        with self.lock:
+            self.created.pop(id(connection), None)
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def is_healthy(self, connection, created: float, released: float) -> bool:
+        """
+        Check whether an idle connection can be reused.
+        Connections that were idle for a while are checked with a roundtrip to the database.
+        """
+        now = time.monotonic()
+        if connection.closed or now - created > self.max_age:
+            return False
+        if now - released < self.health_check_after:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            return True
+        except Exception:
+            return False
+
+
+class DatabaseWrapper(PostGISDatabaseWrapper):
+    """
+    The PostGIS backend, but connections are taken from a pool of the worker process.
+    Closing the connection at the end of a request returns it to the pool instead of disconnecting.
+    """
+
+    def get_pool(self) -> ConnectionPool:
+        """
+        Get the pool of this process. Forked processes never share the pool of their parent.
+        """
+        with pools_lock:
+            pool = pools.get(self.alias)
+            if pool is None or pool.pid != os.getpid():
+                pool = ConnectionPool(
+                    size=self.settings_dict.get("POOL_SIZE", 4),
+                    timeout=self.settings_dict.get("POOL_TIMEOUT", 10),
+                    max_age=self.settings_dict.get("POOL_MAX_AGE", 3600),
+                    health_check_after=self.settings_dict.get("POOL_HEALTH_CHECK_AFTER", 30),
+                )
+                pools[self.alias] = pool
+            return pool
+
+    def get_new_connection(self, conn_params):
+        connection = self.get_pool().acquire(
+            lambda: super(DatabaseWrapper, self).get_new_connection(conn_params)
+        )
+        # Reused connections skip the setup of the parent class
+        options = self.settings_dict["OPTIONS"]
+        self.isolation_level = IsolationLevel(
+            options.get("isolation_level", IsolationLevel.READ_COMMITTED)
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.get_pool().release(self.connection)
@@ -23,6 +23,13 @@ HEALTHCHECK_TOKEN = os.environ.get('HEALTHCHECK_TOKEN', 'healthcheck-token')
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/4.0/howto/deployment/checklist/
 
+# The match request that warms up the workers, one of the bundled example routes.
+WARMUP_ROUTE_FILE = os.environ.get("WARMUP_ROUTE_FILE", str(BASE_DIR.parent / "example-route.json"))
+
+# How long the workers cache the dataset version for the ETags of match responses, in seconds.
+# Imports are only visible to conditional requests after this time.
+DATASET_VERSION_TTL = float(os.environ.get("DATASET_VERSION_TTL", "10"))
+
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = os.environ.get("DEBUG", "True") == "True"
 
@@ -48,6 +55,17 @@ else:
 # SECURITY WARNING: keep the API key used in production secret!
 API_KEY = os.environ.get("API_KEY", "secret")
 
+# The overpass API used by the import commands.
+# Point this to a local server to test the imports without the public API.
+OVERPASS_API = os.environ.get("OVERPASS_API", "https://overpass-api.de/api/interpreter")
+# How many tiles are fetched concurrently from the overpass API
+OVERPASS_WORKERS = int(os.environ.get("OVERPASS_WORKERS", "2"))
+# How often a failed request to the overpass API is retried, with exponential backoff in seconds
+OVERPASS_RETRIES = int(os.environ.get("OVERPASS_RETRIES", "5"))
+OVERPASS_BACKOFF = float(os.environ.get("OVERPASS_BACKOFF", "2"))
+# The timeout in seconds of a single request to the overpass API
+OVERPASS_TIMEOUT = float(os.environ.get("OVERPASS_TIMEOUT", "180"))
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -62,6 +80,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "backend.middleware.TimingMiddleware",
+    "backend.middleware.ProfilingMiddleware",
+    "backend.middleware.QueryAccountingMiddleware",
+    "backend.middleware.CompressionMiddleware",
+    "backend.middleware.AdmissionControlMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -71,6 +94,67 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# Limits of the match endpoints, to keep the latency of a worker predictable
+MAX_ROUTE_POINTS = int(os.environ.get("MAX_ROUTE_POINTS", "5000"))
+MAX_THRESHOLD = int(os.environ.get("MAX_THRESHOLD", "500"))
+MAX_ELONGATION = int(os.environ.get("MAX_ELONGATION", "500"))
+MAX_INSTRUCTIONS = int(os.environ.get("MAX_INSTRUCTIONS", "1000"))
+# The time budget of a match request in seconds (0 means unlimited)
+REQUEST_TIME_BUDGET = float(os.environ.get("REQUEST_TIME_BUDGET", "5"))
+# How many match requests a worker process serves at the same time (0 means unlimited).
+# Gunicorn sets this to the threads of sync and threaded workers, the limit matters for the asgi worker.
+MAX_IN_FLIGHT_REQUESTS = int(os.environ.get("MAX_IN_FLIGHT_REQUESTS", "16"))
+# Match requests that waited longer than this in front of the workers are shed, in seconds (0 means never).
+# The wait is measured from the X-Request-Start header of the proxy, requests without it are not shed.
+MAX_QUEUE_TIME = float(os.environ.get("MAX_QUEUE_TIME", "1"))
+# When clients should retry after a request was shed, in seconds
+RETRY_AFTER = int(os.environ.get("RETRY_AFTER", "1"))
+
+# Points of interest are snapped onto the edges of the routing graph within this distance in meters.
+# Match requests with edge ids use the snapped points of interest for thresholds up to this distance.
+EDGE_SNAP_THRESHOLD = int(os.environ.get("EDGE_SNAP_THRESHOLD", "25"))
+
+# How long the previous match of a session is kept for incremental rerouting, in seconds,
+# and how many sessions are kept at most, in a database table that all worker processes share
+MATCH_SESSION_TTL = int(os.environ.get("MATCH_SESSION_TTL", "600"))
+MAX_MATCH_SESSIONS = int(os.environ.get("MAX_MATCH_SESSIONS", "10000"))
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "match-sessions": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        # Created by the migrations of the pois app
+        "LOCATION": "pois_match_sessions",
+        "TIMEOUT": MATCH_SESSION_TTL,
+        "OPTIONS": {"MAX_ENTRIES": MAX_MATCH_SESSIONS},
+    },
+}
+
+# The worker processes write their metrics into this directory, so that /metrics reports the sums of all of them
+# (empty means that each process only reports its own). Gunicorn clears it when it starts.
+METRICS_DIR = os.environ.get("METRICS_DIR", "")
+# How often a worker process writes its metrics, in seconds
+METRICS_FLUSH_INTERVAL = float(os.environ.get("METRICS_FLUSH_INTERVAL", "1"))
+
+# Send the durations of the stages of match requests in a Server-Timing header
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "True") == "True"
+
+# Log match requests that make more database queries than this (0 means no budget)
+QUERY_BUDGET = int(os.environ.get("QUERY_BUDGET", "50"))
+# Requests that carry this token in an X-Profile header or a profile query parameter are profiled
+# with cProfile (empty means disabled), and the profiles are written into the dump directory
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
+PROFILE_DUMP_DIR = os.environ.get("PROFILE_DUMP_DIR", "/tmp/profiles")
+
+# Compress responses with brotli or gzip, if the client accepts it
+RESPONSE_COMPRESSION = os.environ.get("RESPONSE_COMPRESSION", "True") == "True"
+# Shorter responses are not worth compressing
+RESPONSE_COMPRESSION_MIN_LENGTH = 512
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.environ.get("BROTLI_QUALITY", "5"))
+
 ROOT_URLCONF = "backend.urls"
 
 TEMPLATES = [
@@ -95,6 +179,15 @@ WSGI_APPLICATION = "backend.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/4.0/ref/settings/#databases
 
+# How many database connections each worker process may hold in its pool.
+# Sync workers need one connection, threaded workers one per thread.
+# Set to 0 to use Django's persistent per-thread connections without a pool.
+POSTGRES_POOL_SIZE = int(os.environ.get("POSTGRES_POOL_SIZE", "0"))
+
+# Whether the hot spatial queries are run as server-side prepared statements.
+# Disable this when the database is behind a transaction-pooling proxy such as pgbouncer.
+POSTGRES_PREPARED_STATEMENTS = os.environ.get("POSTGRES_PREPARED_STATEMENTS", "True") == "True"
+
 DATABASES = {
     "default": {
         # PostGIS database
@@ -104,9 +197,29 @@ DATABASES = {
         "PASSWORD": os.environ.get("POSTGRES_PASSWORD"),
         "HOST": os.environ.get("POSTGRES_HOST"),
         "PORT": os.environ.get("POSTGRES_PORT"),
+        # Keep connections open between requests, and check them before they are reused
+        "CONN_MAX_AGE": int(os.environ.get("POSTGRES_CONN_MAX_AGE", "600")),
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
+if POSTGRES_POOL_SIZE > 0:
+    DATABASES["default"].update(
+        {
+            # PostGIS database with a connection pool per worker process
+            "ENGINE": "backend.postgis_pool",
+            # Connections are returned to the pool after each request
+            "CONN_MAX_AGE": 0,
+            "POOL_SIZE": POSTGRES_POOL_SIZE,
+            # How long a request waits for a free connection, in seconds
+            "POOL_TIMEOUT": float(os.environ.get("POSTGRES_POOL_TIMEOUT", "10")),
+            # Pooled connections are reopened after this many seconds
+            "POOL_MAX_AGE": float(os.environ.get("POSTGRES_POOL_MAX_AGE", "3600")),
+            # Pooled connections that were idle for this many seconds are checked before they are reused
+            "POOL_HEALTH_CHECK_AFTER": float(os.environ.get("POSTGRES_POOL_HEALTH_CHECK_AFTER", "30")),
+        }
+    )
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
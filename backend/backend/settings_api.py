@@ -0,0 +1,32 @@
+"""
+Django settings for an API-only deployment of the backend.
+
+Only the apps and middleware needed by the JSON endpoints are loaded,
+which cuts import time and per-request overhead. The admin interface,
+sessions, authentication and messages are not available.
+
+Use it with DJANGO_SETTINGS_MODULE=backend.settings_api.
+"""
+
+from backend.settings import *  # noqa: F401,F403
+
+INSTALLED_APPS = [
+    "django.contrib.gis",
+    "pois",
+]
+
+# The endpoints are csrf exempt and don't use sessions or users
+MIDDLEWARE = [
+    "backend.middleware.TimingMiddleware",
+    "backend.middleware.ProfilingMiddleware",
+    "backend.middleware.QueryAccountingMiddleware",
+    "backend.middleware.CompressionMiddleware",
+    "backend.middleware.AdmissionControlMiddleware",
+    "django.middleware.security.SecurityMiddleware",
+    "django.middleware.common.CommonMiddleware",
+]
+
+# No templates are rendered
+TEMPLATES = []
+
+AUTH_PASSWORD_VALIDATORS = []
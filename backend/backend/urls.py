@@ -14,15 +14,22 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
+from django.apps import apps
 from django.conf import settings
-from django.contrib import admin
 from django.urls import include, path
 
-from backend.views import HealthcheckView, StatusView
+from backend.views import HealthcheckView, MetricsView, ReadinessView, StatusView
 
 urlpatterns = [
     path("pois/", include("pois.urls")),
-    path(settings.ADMIN_URL, admin.site.urls),
     path('status', StatusView.as_view(), name='status'),
     path('healthcheck', HealthcheckView.as_view(), name='healthcheck'),
+    path('readiness', ReadinessView.as_view(), name='readiness'),
+    path('metrics', MetricsView.as_view(), name='metrics'),
 ]
+
+# The admin interface is not part of the API-only settings
+if apps.is_installed("django.contrib.admin"):
+    from django.contrib import admin
+
+    urlpatterns.append(path(settings.ADMIN_URL, admin.site.urls))
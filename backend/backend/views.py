@@ -1,11 +1,11 @@
-from datetime import datetime
-
-from django.apps import apps
 from django.conf import settings
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import View
+from pois.timing import render_metrics
+
+from backend.warmup import warm_up
 
 
 class StatusView(View):
@@ -23,7 +23,26 @@ class StatusView(View):
 @method_decorator(csrf_exempt, name='dispatch')
 class HealthcheckView(View):
     """
-    View to get the healthcheck.
+    View to get the healthcheck, i.e. whether the worker is alive.
+    Use the readiness view to check whether the worker can serve requests.
+    """
+
+    def get(self, request, *args, **kwargs):
+        """
+        Handle the GET request.
+        """
+        token = settings.HEALTHCHECK_TOKEN
+        if token and token != request.GET.get('token'):
+            return JsonResponse({'status': 'unauthorized'}, status=401)
+
+        return JsonResponse({'status': 'ok'})
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class ReadinessView(View):
+    """
+    View to get the readiness, i.e. whether the worker can serve requests.
+    Runs the warm-up, so that the first real request does not pay its costs.
     """
 
     def get(self, request, *args, **kwargs):
@@ -33,14 +52,31 @@ class HealthcheckView(View):
         token = settings.HEALTHCHECK_TOKEN
         if token and token != request.GET.get('token'):
             return JsonResponse({'status': 'unauthorized'}, status=401)
-        
-        # Fetch all objects from all models.
-        # This will heat the cache and make sure 
-        # the database is available.
-        now = datetime.now()
-        for model in apps.get_models():
-            model.objects.all()
-        time = (datetime.now() - now).total_seconds()
-        print(f'OK: Healthcheck took {time} seconds')
-        
-        return JsonResponse({'status': 'ok', 'time': time})
+
+        try:
+            timings = warm_up()
+        except Exception as e:
+            print(f'NOT READY: Warm-up failed: {e}')
+            return JsonResponse({'status': 'not ready', 'error': str(e)}, status=503)
+
+        time = sum(timings.values())
+        print(f'OK: Warm-up took {time} seconds')
+
+        return JsonResponse({'status': 'ok', 'time': time, 'stages': timings})
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class MetricsView(View):
+    """
+    View to get the request and stage durations of this worker in the Prometheus text format.
+    """
+
+    def get(self, request, *args, **kwargs):
+        """
+        Handle the GET request.
+        """
+        token = settings.HEALTHCHECK_TOKEN
+        if token and token != request.GET.get('token'):
+            return JsonResponse({'status': 'unauthorized'}, status=401)
+
+        return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
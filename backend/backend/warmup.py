@@ -0,0 +1,86 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.gis.geos import LineString, Point
+from django.db import connection
+from pois.models import POI_CATEGORIES
+from pois.queries import STATEMENTS, fetch
+from pois.views import get_all_segments, match_landmark_to_decisionpoint
+
+
+def load_warmup_route():
+    """
+    Load the route of the warm-up request, one of the bundled example-route*.json files.
+    """
+    with open(settings.WARMUP_ROUTE_FILE, "r") as file:
+        data = json.load(file)
+    route = LineString(
+        [(point["lon"], point["lat"]) for point in data["route"]], srid=settings.LONLAT
+    )
+    return route, data.get("elongation", 20), data.get("threshold", 5)
+
+
+def warm_up_connection(route, threshold) -> tuple:
+    """
+    Open the database connection of the current thread, prepare the queries on it and load the spatial indexes.
+    Returns the time needed to connect and to prepare the queries in seconds.
+    """
+    start = time.time()
+    connection.ensure_connection()
+    connected = time.time() - start
+
+    start = time.time()
+    # Running every statement once prepares it and loads the upper levels of its index
+    # The parameters of the statements, by their types
+    params = {"bytea": bytes(route.wkb), "float8": threshold, "text[]": POI_CATEGORIES, "int8[]": []}
+    for name, (types, _) in STATEMENTS.items():
+        fetch(name, [params[kind] for kind in types])
+    prepared = time.time() - start
+    return connected, prepared
+
+
+def warm_up(threads: int = 1) -> dict:
+    """
+    Pay the costs of the first request of a worker in advance.
+    Opens the database connection, prepares the queries and loads the spatial indexes,
+    and runs a synthetic match on the warm-up route.
+    With more than one thread, as many pooled connections (up to the size of the pool) are warmed up at once
+    on helper threads and returned to the pool, so that every request thread of a threaded worker gets a prepared connection.
+    Returns the time needed for each stage in seconds.
+    """
+    timings = {}
+    route, elongation, threshold = load_warmup_route()
+
+    # Threads beyond the size of the pool would wait for a slot that is only freed after the barrier
+    threads = min(threads, max(settings.POSTGRES_POOL_SIZE, 1))
+    if threads > 1:
+        barrier = threading.Barrier(threads)
+
+        def warm_up_pooled_connection():
+            try:
+                warm_up_connection(route, threshold)
+            finally:
+                try:
+                    # Hold the connection until every thread has one, so that each warms up another one
+                    barrier.wait(timeout=settings.DATABASES["default"].get("POOL_TIMEOUT", 10))
+                finally:
+                    # Return the connection to the pool, even if another thread did not get one
+                    connection.close()
+
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            for future in [executor.submit(warm_up_pooled_connection) for _ in range(threads)]:
+                future.result()
+        timings["connections"] = time.time() - start
+    else:
+        timings["database"], timings["indexes"] = warm_up_connection(route, threshold)
+
+    start = time.time()
+    get_all_segments(route, elongation, threshold)
+    match_landmark_to_decisionpoint(Point(route.coords[-1], srid=settings.LONLAT))
+    timings["match"] = time.time() - start
+
+    return timings
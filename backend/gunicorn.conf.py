@@ -0,0 +1,148 @@
+"""
+Gunicorn configuration for production.
+
+All options can be set with environment variables:
+
+GUNICORN_WORKERS - The number of worker processes, by default one per CPU that the container may use.
+GUNICORN_WORKER_CLASS - "sync", "gthread" or "asgi" (served by uvicorn).
+GUNICORN_THREADS - The number of threads per gthread worker.
+GUNICORN_PRELOAD - Whether the application is loaded once in the master process and shared with the workers.
+GUNICORN_TIMEOUT - Workers silent for more than this many seconds are restarted.
+"""
+
+import glob
+import math
+import multiprocessing
+import os
+
+WORKER_CLASSES = {
+    "sync": "sync",
+    "gthread": "gthread",
+    "asgi": "uvicorn.workers.UvicornWorker",
+}
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+
+
+def available_cpus() -> int:
+    """
+    Get the number of CPUs that this process may use.
+    This is the CPU quota of the cgroup of the container, if there is one, at most the CPUs that the process may run on.
+    The core count of the host is ignored, because it says nothing about the limits of a container.
+    """
+    if hasattr(os, "sched_getaffinity"):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = multiprocessing.cpu_count()
+
+    quota = None
+    try:
+        # cgroup v2, e.g. "200000 100000" or "max 100000"
+        with open("/sys/fs/cgroup/cpu.max", "r") as file:
+            limit, period = file.read().split()
+        if limit != "max":
+            quota = int(limit) / int(period)
+    except (OSError, ValueError):
+        try:
+            # cgroup v1, a quota of -1 means unlimited
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us", "r") as file:
+                limit = int(file.read())
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us", "r") as file:
+                period = int(file.read())
+            if limit > 0 and period > 0:
+                quota = limit / period
+        except (OSError, ValueError):
+            pass
+
+    if quota is not None:
+        cpus = min(cpus, max(1, math.ceil(quota)))
+    return cpus
+
+
+workers = int(os.environ.get("GUNICORN_WORKERS", available_cpus()))
+
+worker_type = os.environ.get("GUNICORN_WORKER_CLASS", "sync")
+if worker_type not in WORKER_CLASSES:
+    raise ValueError(f"Unknown worker class: {worker_type}")
+worker_class = WORKER_CLASSES[worker_type]
+
+wsgi_app = "backend.asgi:application" if worker_type == "asgi" else "backend.wsgi:application"
+
+threads = int(os.environ.get("GUNICORN_THREADS", "4")) if worker_type == "gthread" else 1
+
+# Each thread of a worker needs its own database connection
+if worker_type == "gthread":
+    os.environ.setdefault("POSTGRES_POOL_SIZE", str(threads))
+
+# Sync and threaded workers never serve more requests than they have threads,
+# so requests are shed by the time they waited in front of the workers instead
+if worker_type != "asgi":
+    os.environ.setdefault("MAX_IN_FLIGHT_REQUESTS", str(threads))
+
+preload_app = os.environ.get("GUNICORN_PRELOAD", "True") == "True"
+
+# The workers write their metrics into a shared directory, so that /metrics reports the sums of all workers
+os.environ.setdefault("METRICS_DIR", "/tmp/pois-metrics")
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "30"))
+
+
+def on_starting(server):
+    """
+    Remove the metrics of the workers of a previous run, so that the sums start from zero.
+    """
+    directory = os.environ["METRICS_DIR"]
+    if directory:
+        for path in glob.glob(os.path.join(directory, "*.json")):
+            os.remove(path)
+
+
+def when_ready(server):
+    """
+    Load the shared application state in the master process, before the workers are forked.
+    """
+    if not preload_app:
+        return
+    from backend.preload import preload
+
+    timings = preload()
+    server.log.info(
+        "Preloaded application state: "
+        + ", ".join(f"{stage} {round(seconds, 3)}s" for stage, seconds in timings.items())
+    )
+
+
+def post_worker_init(worker):
+    """
+    Warm up each worker before it accepts requests.
+    Sync workers serve requests on the thread that runs the warm-up and keep its connection.
+    Threaded workers warm up a pooled connection for each of their threads instead.
+    """
+    from backend.warmup import warm_up
+    from django.conf import settings
+    from django.db import connections
+
+    try:
+        timings = warm_up(threads if settings.POSTGRES_POOL_SIZE > 0 else 1)
+    except Exception as e:
+        worker.log.warning(f"Warm-up failed: {e}")
+        return
+    finally:
+        # Anything but a sync worker without a pool never serves requests on this thread,
+        # so its connection would hold a slot of the pool, or a database connection, for good.
+        # Closing returns a pooled connection, prepared, to the pool.
+        if worker_type != "sync" or settings.POSTGRES_POOL_SIZE > 0:
+            connections.close_all()
+    worker.log.info(
+        "Warmed up worker: "
+        + ", ".join(f"{stage} {round(seconds, 3)}s" for stage, seconds in timings.items())
+    )
+
+
+def worker_exit(server, worker):
+    """
+    Write the last metrics of a worker before it exits.
+    """
+    from pois.timing import flush
+
+    flush(force=True)
@@ -0,0 +1,57 @@
+# The output formats of matched segments
+OUTPUT_FORMATS = ["coordinates", "polyline", "linear"]
+
+
+def compact_segment(segment: list, precision: int = None, dedupe: bool = False) -> list:
+    """
+    Round the [lon, lat] coordinates of a segment and drop consecutive duplicate points.
+    """
+    if precision is not None:
+        segment = [[round(lon, precision), round(lat, precision)] for lon, lat in segment]
+    if dedupe:
+        compacted = []
+        for coordinate in segment:
+            if not compacted or compacted[-1] != coordinate:
+                compacted.append(coordinate)
+        segment = compacted
+    return segment
+
+
+def encode_polyline(segment: list, precision: int = 5) -> str:
+    """
+    Encode [lon, lat] coordinates with the encoded polyline algorithm.
+    See: https://developers.google.com/maps/documentation/utilities/polylinealgorithm
+    Note that the polyline contains the coordinates in lat, lon order.
+    """
+    factor = 10**precision
+    encoded = []
+    previous_lat = 0
+    previous_lon = 0
+    for lon, lat in segment:
+        lat = round(lat * factor)
+        lon = round(lon * factor)
+        for delta in (lat - previous_lat, lon - previous_lon):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                encoded.append(chr((0x20 | (value & 0x1F)) + 63))
+                value >>= 5
+            encoded.append(chr(value + 63))
+        previous_lat = lat
+        previous_lon = lon
+    return "".join(encoded)
+
+
+def format_segments(
+    segments: list, output_format: str = "coordinates", precision: int = None, dedupe: bool = False
+) -> list:
+    """
+    Format matched segments for the response.
+    Segments are lists of [lon, lat] coordinates, or encoded polylines with the given precision (5 by default).
+    """
+    if output_format == "polyline":
+        precision = 5 if precision is None else precision
+        return [
+            encode_polyline(compact_segment(segment, precision, dedupe), precision)
+            for segment in segments
+        ]
+    return [compact_segment(segment, precision, dedupe) for segment in segments]
@@ -0,0 +1,129 @@
+import functools
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.http import HttpResponseNotModified
+from django.utils.http import parse_etags
+from pois.models import DatasetVersion
+
+# The dataset version of this process, the threshold the edges were snapped with and when they were read
+cached_version = {"version": None, "edge_snap_threshold": None, "read": 0.0}
+
+
+def read_dataset_version():
+    """
+    Read the dataset version and the edge snapping threshold, at most every DATASET_VERSION_TTL seconds.
+    """
+    now = time.monotonic()
+    if (
+        cached_version["version"] is None
+        or now - cached_version["read"] > settings.DATASET_VERSION_TTL
+    ):
+        row = DatasetVersion.objects.values_list("version", "edge_snap_threshold").first()
+        version, edge_snap_threshold = row or (0, None)
+        cached_version["version"] = version
+        cached_version["edge_snap_threshold"] = edge_snap_threshold
+        cached_version["read"] = now
+    return cached_version
+
+
+def get_dataset_version() -> int:
+    """
+    Get the version of the imported data.
+    The version is cached for a few seconds, so that conditional requests don't need a query.
+    """
+    return read_dataset_version()["version"]
+
+
+def get_edge_snap_threshold():
+    """
+    Get the threshold in meters the points of interest were snapped onto edges with, or None if they were not snapped.
+    Cached like the dataset version.
+    """
+    return read_dataset_version()["edge_snap_threshold"]
+
+
+def parse_json(request):
+    """
+    Parse the JSON body of a request, only once for the ETag, the session check and the view.
+    Raises JSONDecodeError (or UnicodeDecodeError) if the body is invalid.
+    """
+    if not hasattr(request, "json_body"):
+        request.json_body = json.loads(request.body)
+    return request.json_body
+
+
+def compute_etag(request) -> str:
+    """
+    Compute a strong ETag from the canonical form of a request and the dataset version.
+    Requests that only differ in whitespace or key order of their JSON body get the same ETag.
+    """
+    try:
+        body = json.dumps(parse_json(request), sort_keys=True, separators=(",", ":")).encode()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        body = request.body
+    query = "&".join(
+        f"{key}={value}"
+        for key, values in sorted(request.GET.lists())
+        for value in sorted(values)
+    )
+
+    digest = hashlib.sha256()
+    digest.update(request.path.encode())
+    digest.update(b"\0" + query.encode())
+    digest.update(b"\0" + str(get_dataset_version()).encode())
+    digest.update(b"\0" + body)
+    return f'"{digest.hexdigest()}"'
+
+
+def etag_matches(etag: str, header: str) -> bool:
+    """
+    Check if an ETag is listed in an If-None-Match header, which uses the weak comparison.
+    """
+    if header.strip() == "*":
+        return True
+    return any(
+        (tag[2:] if tag.startswith("W/") else tag) == etag for tag in parse_etags(header)
+    )
+
+
+def has_session(request) -> bool:
+    """
+    Check whether a match request belongs to a match session, whose responses differ for the same request.
+    """
+    try:
+        data = parse_json(request)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return False
+    return isinstance(data, dict) and "session" in data
+
+
+def conditional_match(view):
+    """
+    Support conditional requests for a match view.
+    If the client already has the response for the same request and dataset version,
+    304 Not Modified is returned before any matching happens.
+    Requests of a match session always get a new response, with the token of the next request.
+    """
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if has_session(request):
+            return view(request, *args, **kwargs)
+
+        etag = compute_etag(request)
+        if etag_matches(etag, request.META.get("HTTP_IF_NONE_MATCH", "")):
+            response = HttpResponseNotModified()
+            response["ETag"] = etag
+            return response
+
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200:
+            response["ETag"] = etag
+            # Clients may store the response, but should revalidate it
+            response["Cache-Control"] = "no-cache"
+        return response
+
+    return wrapper
@@ -0,0 +1,39 @@
+import math
+import struct
+
+# The mean earth radius in meters, used for distance approximations on lon/lat coordinates
+EARTH_RADIUS = 6371008.8
+
+
+def haversine(a, b) -> float:
+    """
+    Calculate the distance in meters between two (lon, lat) coordinates.
+    """
+    lon1, lat1 = math.radians(a[0]), math.radians(a[1])
+    lon2, lat2 = math.radians(b[0]), math.radians(b[1])
+    h = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(h))
+
+
+def cumulative_lengths(coordinates, distance=math.dist) -> list:
+    """
+    Calculate the distance along a line to each of its coordinates.
+    """
+    lengths = [0.0]
+    for a, b in zip(coordinates, coordinates[1:]):
+        lengths.append(lengths[-1] + distance(a, b))
+    return lengths
+
+
+def linestring_from_wkb(wkb) -> list:
+    """
+    Read the (x, y) coordinates of a 2D LineString from WKB, without building a geometry.
+    """
+    byte_order = "<" if wkb[0] == 1 else ">"
+    geometry_type, count = struct.unpack_from(byte_order + "II", wkb, 1)
+    if geometry_type != 2:
+        raise ValueError(f"Expected a LineString, got WKB geometry type {geometry_type}")
+    return list(struct.iter_unpack(byte_order + "dd", wkb[9 : 9 + 16 * count]))
@@ -0,0 +1,353 @@
+import functools
+import json
+import math
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager
+
+from django.contrib.gis.geos import LineString, Point
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from pois.geometry import haversine
+from pois.models import DatasetVersion, Edge, Poi, PoiEdge, PoiLine
+
+
+def subdivide_line(coordinates, max_length=None, max_vertices=None) -> list:
+    """
+    Split a line given as (lon, lat) coordinates into consecutive pieces.
+    Each piece is at most max_length meters long and has at most max_vertices vertices.
+    Consecutive pieces share their boundary coordinate, so that no gap is introduced.
+    """
+    coordinates = [tuple(coordinate) for coordinate in coordinates]
+    if max_vertices is not None and max_vertices < 2:
+        raise ValueError("A line piece needs at least 2 vertices")
+    if max_length is not None and max_length <= 0:
+        raise ValueError("The maximum line length must be positive")
+    if len(coordinates) < 2 or (max_length is None and max_vertices is None):
+        return [coordinates]
+
+    pieces = []
+    piece = [coordinates[0]]
+    piece_length = 0
+    for coordinate in coordinates[1:]:
+        segment_start = piece[-1]
+        segment_length = haversine(segment_start, coordinate)
+        # Cut the segment as often as needed to respect the maximum length
+        while max_length is not None and piece_length + segment_length > max_length:
+            fraction = (max_length - piece_length) / segment_length
+            cut = (
+                segment_start[0] + fraction * (coordinate[0] - segment_start[0]),
+                segment_start[1] + fraction * (coordinate[1] - segment_start[1]),
+            )
+            piece.append(cut)
+            pieces.append(piece)
+            piece = [cut]
+            piece_length = 0
+            segment_start = cut
+            segment_length = haversine(segment_start, coordinate)
+        if max_vertices is not None and len(piece) == max_vertices:
+            pieces.append(piece)
+            piece = [piece[-1]]
+            piece_length = 0
+        piece.append(coordinate)
+        piece_length += segment_length
+    if len(piece) > 1:
+        pieces.append(piece)
+    return pieces
+
+
+def build_poi_lines(
+    coordinates, category: str, feature_id: str = "", max_length=None, max_vertices=None
+) -> list:
+    """
+    Build (unsaved) PoiLine objects for a line given as (lon, lat) coordinates.
+    The line is subdivided into bounded pieces if a maximum length or vertex count is given.
+    All pieces keep the id of the original feature.
+    """
+    poi_lines = []
+    for piece in subdivide_line(coordinates, max_length, max_vertices):
+        poi_lines.append(
+            PoiLine(
+                line=LineString(piece, srid=4326),
+                start=Point(piece[0], srid=4326),
+                end=Point(piece[-1], srid=4326),
+                category=category,
+                feature_id=feature_id,
+            )
+        )
+    return poi_lines
+
+
+def add_subdivision_arguments(parser):
+    """
+    Add the command line arguments to control the subdivision of imported lines.
+    """
+    parser.add_argument(
+        "--max-line-length",
+        type=float,
+        default=None,
+        help="Split imported lines into pieces of at most this length in meters",
+    )
+    parser.add_argument(
+        "--max-line-vertices",
+        type=int,
+        default=None,
+        help="Split imported lines into pieces of at most this many vertices",
+    )
+
+
+def clustered_points(points, distance: float) -> list:
+    """
+    Find the points that duplicate an earlier point, given as (id, lon, lat) in the order of their ids.
+    A point is kept if no kept point lies within the distance in meters, so that each removed point
+    lies within the distance of a kept one, and a chain of points is thinned out instead of collapsed.
+    Returns the ids of the points to remove.
+    """
+    points = list(points)
+    if not points:
+        return []
+    # The kept points in a grid of cells in degrees, that are at least the distance wide at every latitude of the points
+    cell_lat = distance / 111000
+    max_lat = max(abs(lat) for _, _, lat in points)
+    cell_lon = cell_lat / max(math.cos(math.radians(max_lat)), 0.01)
+    kept = {}
+    removed = []
+    for poi_id, lon, lat in points:
+        x, y = math.floor(lon / cell_lon), math.floor(lat / cell_lat)
+        if any(
+            haversine((lon, lat), other) <= distance
+            for dx in (-1, 0, 1)
+            for dy in (-1, 0, 1)
+            for other in kept.get((x + dx, y + dy), [])
+        ):
+            removed.append(poi_id)
+        else:
+            kept.setdefault((x, y), []).append((lon, lat))
+    return removed
+
+
+def deduplicate_pois(category: str, distance: float) -> int:
+    """
+    Remove near-duplicate point POIs of a category, e.g. when the same site is imported from several sources.
+    Points that lie within the given distance in meters of a line of the same category are removed.
+    Then, each point that lies within the distance of an earlier imported point that is kept is collapsed into it.
+    Returns the number of removed rows.
+    """
+    assert distance > 0, "Deduplication distance must be positive"
+
+    poi_table = connection.ops.quote_name(Poi._meta.db_table)
+    line_table = connection.ops.quote_name(PoiLine._meta.db_table)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Points that are already covered by a line of the same category
+        cursor.execute(
+            f"""
+            DELETE FROM {poi_table} AS p
+            USING {line_table} AS l
+            WHERE p.category = %s AND l.category = %s
+            AND ST_DWithin(p.coordinate, l.line, %s)
+            """,
+            [category, category, distance],
+        )
+        removed_covered = cursor.rowcount
+
+        # Points that have a kept point of the same category nearby, in one pass in the order of import.
+        # A DELETE ... USING would compare against points that are removed as well, and collapse chains.
+        cursor.execute(
+            f"""
+            SELECT id, ST_X(coordinate::geometry), ST_Y(coordinate::geometry) FROM {poi_table}
+            WHERE category = %s ORDER BY id
+            """,
+            [category],
+        )
+        removed_ids = clustered_points(cursor.fetchall(), distance)
+        cursor.execute(f"DELETE FROM {poi_table} WHERE id = ANY(%s)", [removed_ids])
+        removed_clustered = cursor.rowcount
+
+    print(
+        f"Removed {removed_covered} {category} points covered by lines "
+        f"and {removed_clustered} clustered {category} points within {distance}m"
+    )
+    return removed_covered + removed_clustered
+
+
+def add_deduplication_arguments(parser, default: float = 10):
+    """
+    Add the command line arguments to control the deduplication of imported points.
+    """
+    parser.add_argument(
+        "--dedupe-distance",
+        type=float,
+        default=default,
+        help="Collapse points within this distance in meters into one (0 disables deduplication)",
+    )
+
+
+def snap_to_edges(threshold: float) -> int:
+    """
+    Snap all points and lines of points of interest onto the edges of the routing graph within the threshold in meters.
+    A point is snapped onto every edge near it, as its closest location on the edge.
+    A line is clipped to the buffer of each edge near it, and every piece is snapped as its start and end on the edge.
+    The threshold is stored with the dataset version, see get_edge_snap_threshold.
+    Returns the number of snapped rows.
+    """
+    assert threshold > 0, "Snapping threshold must be positive"
+
+    poi_table = connection.ops.quote_name(Poi._meta.db_table)
+    line_table = connection.ops.quote_name(PoiLine._meta.db_table)
+    edge_table = connection.ops.quote_name(Edge._meta.db_table)
+    poi_edge_table = connection.ops.quote_name(PoiEdge._meta.db_table)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {poi_edge_table}")
+
+        with import_stage("snap points") as stage:
+            cursor.execute(
+                f"""
+                INSERT INTO {poi_edge_table} (edge_id, category, is_line, start, "end", distance)
+                SELECT e.id, p.category, false, s.point, s.point, ST_Distance(p.coordinate, e.geometry)
+                FROM {poi_table} AS p
+                JOIN {edge_table} AS e ON ST_DWithin(p.coordinate, e.geometry, %s)
+                CROSS JOIN LATERAL (
+                    SELECT ST_ClosestPoint(e.geometry::geometry, p.coordinate::geometry)::geography AS point
+                ) AS s
+                """,
+                [threshold],
+            )
+            stage["rows"] = snapped_points = cursor.rowcount
+
+        with import_stage("snap lines") as stage:
+            cursor.execute(
+                f"""
+                INSERT INTO {poi_edge_table} (edge_id, category, is_line, start, "end", distance)
+                SELECT
+                    e.id, l.category, true,
+                    ST_ClosestPoint(e.geometry::geometry, ST_StartPoint(piece.geom))::geography,
+                    ST_ClosestPoint(e.geometry::geometry, ST_EndPoint(piece.geom))::geography,
+                    ST_Distance(l.line, e.geometry)
+                FROM {line_table} AS l
+                JOIN {edge_table} AS e ON ST_DWithin(l.line, e.geometry, %s)
+                CROSS JOIN LATERAL ST_Dump(ST_Intersection(l.line, ST_Buffer(e.geometry, %s))::geometry) AS piece
+                WHERE GeometryType(piece.geom) = 'LINESTRING'
+                """,
+                [threshold, threshold],
+            )
+            stage["rows"] = snapped_lines = cursor.rowcount
+
+        cursor.execute(f"ANALYZE {poi_edge_table}")
+
+        # Edge lookups only answer categories within the threshold that was actually snapped with
+        if not DatasetVersion.objects.filter(pk=1).update(edge_snap_threshold=threshold):
+            DatasetVersion.objects.create(pk=1, version=0, edge_snap_threshold=threshold)
+
+    print(f"Snapped {snapped_points} points and {snapped_lines} line pieces onto edges within {threshold}m")
+    return snapped_points + snapped_lines
+
+
+def bump_dataset_version(pois_changed: bool = True) -> int:
+    """
+    Increase the version of the imported data, which invalidates the ETags of all match responses.
+    If the points of interest changed, their snaps onto edges are stale, so the edge snapping threshold is cleared
+    and all categories are matched geometrically until the pois are snapped again with import_edges --snap-only.
+    """
+    changes = {"version": F("version") + 1, "updated": timezone.now()}
+    if pois_changed:
+        changes["edge_snap_threshold"] = None
+    with transaction.atomic():
+        updated = DatasetVersion.objects.filter(pk=1).update(**changes)
+        if not updated:
+            DatasetVersion.objects.create(pk=1, version=1)
+    version = DatasetVersion.objects.get(pk=1).version
+    print(f"Dataset version is now {version}")
+    return version
+
+
+# The stages of the running import, see profile_import
+current_stages = None
+
+
+def peak_rss_mb() -> float:
+    """
+    Get the peak resident memory of this process so far, in megabytes.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+@contextmanager
+def import_stage(name: str):
+    """
+    Time a stage of the running import, e.g. fetch, decode, build or insert.
+    Yields a dict in which the stage can set the number of rows that it processed.
+    """
+    stage = {"name": name, "rows": None}
+    start = time.perf_counter()
+    try:
+        yield stage
+    finally:
+        stage["seconds"] = round(time.perf_counter() - start, 3)
+        if stage["rows"] is not None and stage["seconds"] > 0:
+            stage["rows_per_second"] = round(stage["rows"] / stage["seconds"], 1)
+        stage["peak_rss_mb"] = peak_rss_mb()
+        if current_stages is not None:
+            current_stages.append(stage)
+
+
+@contextmanager
+def profile_import(command: str, report: str = None):
+    """
+    Profile the stages of an import command.
+    At the end, a summary is printed and, if a report path is given, written as JSON, to be compared between builds.
+    """
+    global current_stages
+    current_stages = stages = []
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        current_stages = None
+        result = {
+            "command": command,
+            "seconds": round(time.perf_counter() - start, 3),
+            "peak_rss_mb": peak_rss_mb(),
+            "stages": stages,
+        }
+        for stage in stages:
+            rows = f", {stage['rows']} rows" if stage["rows"] is not None else ""
+            print(f"Stage {stage['name']}: {stage['seconds']}s{rows}, peak RSS {stage['peak_rss_mb']}MB")
+        print(f"{command} took {result['seconds']}s, peak RSS {result['peak_rss_mb']}MB")
+        if report:
+            os.makedirs(os.path.dirname(os.path.abspath(report)), exist_ok=True)
+            with open(report, "w") as file:
+                json.dump(result, file, indent=2)
+            print(f"Wrote import report to {report}")
+
+
+def profiled_import(handle):
+    """
+    Profile the handle method of an import command, with the report path from its --report argument.
+    """
+
+    @functools.wraps(handle)
+    def wrapper(self, *args, **options):
+        command = self.__module__.rsplit(".", 1)[-1]
+        with profile_import(command, options.get("report")):
+            return handle(self, *args, **options)
+
+    return wrapper
+
+
+def add_profiling_arguments(parser):
+    """
+    Add the command line arguments to control the profiling of imports.
+    """
+    parser.add_argument(
+        "--report",
+        type=str,
+        default=None,
+        help="Write the wall time, rows per second and peak memory of each import stage as JSON into this file",
+    )
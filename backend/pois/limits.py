@@ -0,0 +1,33 @@
+import json
+import time
+
+from django.conf import settings
+from django.http import HttpResponse
+
+
+class Deadline:
+    """
+    The time budget of a request, checked between the expensive steps of matching.
+    """
+
+    def __init__(self, budget: float = None):
+        budget = settings.REQUEST_TIME_BUDGET if budget is None else budget
+        # A budget of 0 means unlimited
+        self.expires = time.monotonic() + budget if budget > 0 else None
+
+    def expired(self) -> bool:
+        """
+        Check if the time budget is used up.
+        """
+        return self.expires is not None and time.monotonic() > self.expires
+
+
+def service_unavailable(error: str) -> HttpResponse:
+    """
+    Tell the client that the request can not be served right now, and when to try again.
+    """
+    response = HttpResponse(
+        json.dumps({"error": error}), status=503, content_type="application/json"
+    )
+    response["Retry-After"] = str(settings.RETRY_AFTER)
+    return response
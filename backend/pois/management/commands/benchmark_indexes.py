@@ -0,0 +1,164 @@
+import json
+import statistics
+
+from django.conf import settings
+from django.contrib.gis.geos import LineString
+from django.contrib.gis.measure import D
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from pois.models import POI_CATEGORIES, Poi, PoiLine
+
+
+def load_route(path) -> LineString:
+    """
+    Load a route from a match request file, such as the bundled example-route.json.
+    """
+    with open(path, "r") as file:
+        route = json.load(file)["route"]
+    return LineString([(point["lon"], point["lat"]) for point in route], srid=settings.LONLAT)
+
+
+def insert_synthetic_rows(count: int, extent):
+    """
+    Insert synthetic points and short lines, evenly distributed over the categories, into the extent.
+    """
+    min_lon, min_lat, max_lon, max_lat = extent
+    params = [POI_CATEGORIES, min_lon, max_lon - min_lon, min_lat, max_lat - min_lat, count]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {connection.ops.quote_name(Poi._meta.db_table)} (category, coordinate)
+            SELECT (%s::text[])[1 + mod(i, {len(POI_CATEGORIES)})],
+                ST_SetSRID(ST_MakePoint(%s + random() * %s, %s + random() * %s), 4326)::geography
+            FROM generate_series(1, %s) AS i
+            """,
+            params,
+        )
+        cursor.execute(
+            f"""
+            INSERT INTO {connection.ops.quote_name(PoiLine._meta.db_table)} (category, line, start, "end", feature_id)
+            SELECT category, ST_MakeLine(p, q)::geography, p::geography, q::geography, ''
+            FROM (
+                SELECT (%s::text[])[1 + mod(i, {len(POI_CATEGORIES)})] AS category,
+                    ST_SetSRID(ST_MakePoint(%s + random() * %s, %s + random() * %s), 4326) AS p,
+                    ST_SetSRID(ST_MakePoint(%s + random() * %s, %s + random() * %s), 4326) AS q
+                FROM generate_series(1, %s) AS i
+            ) AS synthetic
+            """,
+            params[:-1] + params[1:],
+        )
+        cursor.execute(f"ANALYZE {connection.ops.quote_name(Poi._meta.db_table)}")
+        cursor.execute(f"ANALYZE {connection.ops.quote_name(PoiLine._meta.db_table)}")
+
+
+def drop_category_indexes():
+    """
+    Drop the per-category indexes, leaving the single spatial index of each table.
+    """
+    with connection.cursor() as cursor:
+        for model in [Poi, PoiLine]:
+            for index in model._meta.indexes:
+                cursor.execute(f"DROP INDEX {connection.ops.quote_name(index.name)}")
+
+
+def collect_plan(plan: dict, nodes: list):
+    """
+    Collect the node types and used indexes of a query plan.
+    """
+    node = plan["Node Type"]
+    if "Index Name" in plan:
+        node += f" on {plan['Index Name']}"
+    nodes.append(node)
+    for child in plan.get("Plans", []):
+        collect_plan(child, nodes)
+    return nodes
+
+
+def explain(queryset, repeat: int) -> dict:
+    """
+    Run a query several times with EXPLAIN ANALYZE and report its plan and median execution time.
+    """
+    times = []
+    for _ in range(repeat):
+        result = json.loads(queryset.explain(format="json", analyze=True))[0]
+        times.append(result["Execution Time"])
+    return {
+        "plan": collect_plan(result["Plan"], []),
+        "ms": round(statistics.median(times), 3),
+    }
+
+
+class Command(BaseCommand):
+    help = """
+    Benchmark the corridor queries with and without the per-category spatial indexes for growing row counts.
+    The benchmark runs in a disposable test database, which is created and destroyed by this command,
+    so that the tables that serve requests are never locked.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows",
+            type=str,
+            default="1000,10000,100000,1000000",
+            help="Comma separated total numbers of synthetic points and lines",
+        )
+        parser.add_argument(
+            "--route",
+            type=str,
+            default=str(settings.BASE_DIR.parent / "example-route.json"),
+            help="The match request file with the route to query",
+        )
+        parser.add_argument("--threshold", type=int, default=20, help="The matching threshold in meters")
+        parser.add_argument("--repeat", type=int, default=5, help="How often each query is repeated")
+        parser.add_argument("--output", type=str, default=None, help="Write the results as JSON into this file")
+
+    def handle(self, *args, **options):
+        """
+        Run the benchmark.
+        """
+        route = load_route(options["route"])
+        # Spread the synthetic rows around the route
+        min_lon, min_lat, max_lon, max_lat = route.extent
+        extent = (min_lon - 0.05, min_lat - 0.05, max_lon + 0.05, max_lat + 0.05)
+        distance = D(m=options["threshold"])
+
+        results = []
+        old_database_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            with transaction.atomic():
+                inserted = 0
+                for rows in sorted(int(value) for value in options["rows"].split(",")):
+                    insert_synthetic_rows(rows - inserted, extent)
+                    inserted = rows
+
+                    for variant in ["category", "global"]:
+                        savepoint = transaction.savepoint()
+                        if variant == "global":
+                            drop_category_indexes()
+                        for category in POI_CATEGORIES:
+                            points = Poi.objects.filter(category=category, coordinate__dwithin=(route, distance))
+                            lines = PoiLine.objects.filter(category=category, line__dwithin=(route, distance))
+                            result = {
+                                "rows": rows,
+                                "indexes": variant,
+                                "category": category,
+                                "points": explain(points, options["repeat"]),
+                                "lines": explain(lines, options["repeat"]),
+                            }
+                            print(
+                                f"{rows} rows, {variant} indexes, {category}: "
+                                f"points {result['points']['ms']}ms ({', '.join(result['points']['plan'])}), "
+                                f"lines {result['lines']['ms']}ms ({', '.join(result['lines']['plan'])})"
+                            )
+                            results.append(result)
+                        # Restore the dropped indexes
+                        transaction.savepoint_rollback(savepoint)
+        finally:
+            connection.creation.destroy_test_db(old_database_name, verbosity=0)
+
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                json.dump(results, file, indent=2)
+            print(f"Wrote results to {options['output']}")
@@ -0,0 +1,167 @@
+import json
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.gis.geos import LineString, Point
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from pois.models import Landmark, Poi, PoiLine
+from pois.synthetic import synthetic_pois_along, synthetic_route
+from pois.views import (
+    determine_direction_landmark,
+    get_all_segments,
+    match_landmark_to_decisionpoint,
+    merge_segments,
+)
+
+
+def measure(function, repeat: int) -> float:
+    """
+    Run a function several times and return its median run time in milliseconds.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def load_dataset(route: list, density: float, seed: int):
+    """
+    Replace all POIs and landmarks with synthetic ones along the route.
+    """
+    Poi.objects.all().delete()
+    PoiLine.objects.all().delete()
+    Landmark.objects.all().delete()
+    dataset = synthetic_pois_along(route, density, seed=seed)
+    Poi.objects.bulk_create(dataset["pois"])
+    PoiLine.objects.bulk_create(dataset["lines"])
+    Landmark.objects.bulk_create(dataset["landmarks"])
+    with connection.cursor() as cursor:
+        for model in [Poi, PoiLine, Landmark]:
+            cursor.execute(f"ANALYZE {connection.ops.quote_name(model._meta.db_table)}")
+
+
+def benchmark(vertices: int, density: float, threshold: int, elongation: int, repeat: int, seed: int) -> dict:
+    """
+    Benchmark the matching hot paths on a synthetic route with synthetic POIs and landmarks.
+    """
+    route = synthetic_route(vertices, seed=seed)
+    load_dataset(route, density, seed)
+    route_linestring = LineString(route, srid=settings.LONLAT)
+
+    rng = random.Random(seed)
+    intervals = []
+    for _ in range(vertices):
+        start = rng.uniform(0, vertices * 15)
+        intervals.append([start, start + rng.uniform(0, 100)])
+
+    # One decision point every 10 route points, as with typical instructions
+    decision_indices = list(range(0, vertices - 1, 10))[:100] or [0]
+    route_points = {index: {"lon": lon, "lat": lat} for index, (lon, lat) in enumerate(route)}
+    landmark = {"lon": route[0][0] + 0.0001, "lat": route[0][1] + 0.0001}
+
+    def run_get_segments():
+        get_all_segments(route_linestring, elongation, threshold)
+
+    def run_match_landmarks():
+        for index in decision_indices:
+            match_landmark_to_decisionpoint(Point(route[index], srid=settings.LONLAT))
+
+    def run_determine_direction():
+        for index in decision_indices:
+            determine_direction_landmark(index, route_points, landmark)
+
+    return {
+        "merge_segments": measure(lambda: merge_segments([list(i) for i in intervals]), repeat),
+        "get_segments": measure(run_get_segments, repeat),
+        "match_landmark_to_decisionpoint": measure(run_match_landmarks, repeat),
+        "determine_direction_landmark": measure(run_determine_direction, repeat),
+    }
+
+
+class Command(BaseCommand):
+    help = """
+    Benchmark the matching hot paths on synthetic routes and POI densities.
+    The benchmark runs in a disposable test database, which is created and destroyed by this command.
+    Results can be saved as a baseline, and compared to a baseline to detect regressions.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--vertices", type=str, default="10,100,1000,10000", help="Comma separated route sizes")
+        parser.add_argument(
+            "--densities",
+            type=str,
+            default="1,10",
+            help="Comma separated POIs per kilometer of route, for each category and for the landmarks",
+        )
+        parser.add_argument("--threshold", type=int, default=10, help="The matching threshold in meters")
+        parser.add_argument("--elongation", type=int, default=20, help="The elongation of points in meters")
+        parser.add_argument("--repeat", type=int, default=5, help="How often each benchmark is repeated")
+        parser.add_argument("--seed", type=int, default=0, help="The seed of the synthetic data")
+        parser.add_argument("--save-baseline", type=str, default=None, help="Save the results as a baseline into this file")
+        parser.add_argument("--baseline", type=str, default=None, help="Compare the results to the baseline in this file")
+        parser.add_argument(
+            "--max-slowdown",
+            type=float,
+            default=1.25,
+            help="Fail if a benchmark is slower than this factor times the baseline",
+        )
+        parser.add_argument(
+            "--min-difference",
+            type=float,
+            default=0.1,
+            help="Ignore slowdowns of less than this many milliseconds, which are noise",
+        )
+
+    def handle(self, *args, **options):
+        """
+        Run the benchmarks.
+        """
+        results = {}
+        old_database_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            for vertices in [int(value) for value in options["vertices"].split(",")]:
+                for density in [float(value) for value in options["densities"].split(",")]:
+                    timings = benchmark(
+                        vertices,
+                        density,
+                        options["threshold"],
+                        options["elongation"],
+                        options["repeat"],
+                        options["seed"],
+                    )
+                    for name, milliseconds in timings.items():
+                        key = f"{name}[vertices={vertices},density={density:g}]"
+                        results[key] = round(milliseconds, 3)
+                        print(f"{key}: {results[key]}ms")
+        finally:
+            connection.creation.destroy_test_db(old_database_name, verbosity=0)
+
+        if options["save_baseline"]:
+            with open(options["save_baseline"], "w") as file:
+                json.dump(results, file, indent=2, sort_keys=True)
+            print(f"Saved baseline to {options['save_baseline']}")
+
+        if options["baseline"]:
+            with open(options["baseline"], "r") as file:
+                baseline = json.load(file)
+            regressions = []
+            for key, milliseconds in results.items():
+                if key not in baseline:
+                    continue
+                slowdown = milliseconds / baseline[key] if baseline[key] > 0 else 1
+                print(f"{key}: {baseline[key]}ms -> {milliseconds}ms ({slowdown:.2f}x)")
+                if (
+                    slowdown > options["max_slowdown"]
+                    and milliseconds - baseline[key] > options["min_difference"]
+                ):
+                    regressions.append(key)
+            if regressions:
+                raise CommandError("Regressions in: " + ", ".join(regressions))
+            print("No regressions found")
@@ -0,0 +1,126 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter for each measurement and prints its timings as JSON
+PROBE = """
+import io
+import json
+import sys
+import time
+from wsgiref.util import setup_testing_defaults
+
+start = time.perf_counter()
+from backend.wsgi import application
+import_time = time.perf_counter() - start
+
+
+def request(method, path, body=b""):
+    environ = {
+        "REQUEST_METHOD": method,
+        "PATH_INFO": path,
+        "CONTENT_TYPE": "application/json",
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.input": io.BytesIO(body),
+    }
+    setup_testing_defaults(environ)
+    status = []
+    start = time.perf_counter()
+    response = application(environ, lambda s, headers, exc_info=None: status.append(s))
+    b"".join(response)
+    response.close()
+    elapsed = time.perf_counter() - start
+    assert status[0].startswith("200"), status[0]
+    return elapsed
+
+
+path, requests, match_file = sys.argv[1], int(sys.argv[2]), sys.argv[3]
+result = {"import": import_time, "first_request": request("GET", path)}
+result["per_request"] = [request("GET", path) for _ in range(requests)]
+if match_file:
+    with open(match_file, "rb") as file:
+        body = file.read()
+    result["first_match"] = request("POST", "/pois/match", body)
+print(json.dumps(result))
+"""
+
+
+def run_probe(settings_module: str, path: str, requests: int, match_file: str) -> dict:
+    """
+    Start a fresh interpreter with the given settings and measure its startup and request latencies.
+    """
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings_module, DEBUG="False")
+    # Without DEBUG the secret key comes from DJANGO_KEY, which signing cookies of the full profile requires
+    env.setdefault("DJANGO_KEY", "benchmark-startup-probe")
+    process = subprocess.run(
+        [sys.executable, "-c", PROBE, path, str(requests), match_file or ""],
+        cwd=settings.BASE_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if process.returncode != 0:
+        raise CommandError(f"Probe for {settings_module} failed:\n{process.stderr}")
+    # The application may print to stdout, the result is the last line
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def milliseconds(seconds: float) -> float:
+    return round(seconds * 1000, 3)
+
+
+class Command(BaseCommand):
+    help = """
+    Benchmark the startup time, first-request latency and per-request overhead of settings profiles.
+    Each run starts a fresh interpreter, as a rescheduled container would.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--profiles",
+            type=str,
+            default="backend.settings,backend.settings_api",
+            help="Comma separated settings modules to compare",
+        )
+        parser.add_argument("--runs", type=int, default=5, help="How many fresh interpreters are started per profile")
+        parser.add_argument("--requests", type=int, default=1000, help="How many requests measure the per-request overhead")
+        parser.add_argument("--path", type=str, default="/status", help="The path that is requested")
+        parser.add_argument(
+            "--match",
+            type=str,
+            default=None,
+            help="Also time a first match request with this request file, e.g. example-route.json (needs the database)",
+        )
+        parser.add_argument("--output", type=str, default=None, help="Write the results as JSON into this file")
+
+    def handle(self, *args, **options):
+        """
+        Run the benchmark.
+        """
+        results = {}
+        for profile in options["profiles"].split(","):
+            runs = [
+                run_probe(profile, options["path"], options["requests"], options["match"])
+                for _ in range(options["runs"])
+            ]
+            per_request = sorted(value for run in runs for value in run["per_request"])
+            result = {
+                "import_ms": milliseconds(statistics.median(run["import"] for run in runs)),
+                "first_request_ms": milliseconds(statistics.median(run["first_request"] for run in runs)),
+                "per_request_p50_ms": milliseconds(per_request[len(per_request) // 2]),
+                "per_request_p99_ms": milliseconds(per_request[int(len(per_request) * 0.99)]),
+            }
+            if options["match"]:
+                result["first_match_ms"] = milliseconds(statistics.median(run["first_match"] for run in runs))
+            results[profile] = result
+            print(f"{profile}: " + ", ".join(f"{key} {value}" for key, value in result.items()))
+
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                json.dump(results, file, indent=2)
+            print(f"Wrote results to {options['output']}")
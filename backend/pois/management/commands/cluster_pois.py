@@ -0,0 +1,67 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from pois.imports import add_profiling_arguments, import_stage, profiled_import
+from pois.models import Landmark, Poi, PoiLine
+
+
+def find_spatial_index(model, field_name: str) -> str:
+    """
+    Find the name of the spatial index that covers the whole table of a model.
+    The per-category indexes are partial and can not be used to cluster a table.
+    """
+    column = model._meta.get_field(field_name).column
+    partial_indexes = {index.name for index in model._meta.indexes if index.condition}
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(
+            cursor, model._meta.db_table
+        )
+    for name, constraint in constraints.items():
+        if (
+            constraint["index"]
+            and constraint["type"] == "gist"
+            and constraint["columns"] == [column]
+            and name not in partial_indexes
+        ):
+            return name
+    return None
+
+
+def cluster_table(model, field_name: str):
+    """
+    Physically reorder the rows of a table along its spatial index and refresh the planner statistics.
+    Rows that are close to each other are then also close to each other on disk.
+    """
+    table = model._meta.db_table
+    index = find_spatial_index(model, field_name)
+    if index is None:
+        print(f"No spatial index found for {table}, skipping")
+        return
+
+    start = time.time()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CLUSTER {connection.ops.quote_name(table)} USING {connection.ops.quote_name(index)}"
+        )
+        cursor.execute(f"ANALYZE {connection.ops.quote_name(table)}")
+    print(f"Clustered {table} using {index} in {round(time.time() - start, 2)} seconds")
+
+
+class Command(BaseCommand):
+    help = """
+    Cluster the POI tables along their spatial indexes after an import.
+    """
+
+    def add_arguments(self, parser):
+        add_profiling_arguments(parser)
+
+    @profiled_import
+    def handle(self, *args, **options):
+        """
+        Cluster all POI tables.
+        """
+        for model, field in [(Poi, "coordinate"), (PoiLine, "line"), (Landmark, "coordinate")]:
+            with import_stage(f"index {model._meta.db_table}") as stage:
+                cluster_table(model, field)
+                stage["rows"] = model.objects.count()
@@ -0,0 +1,112 @@
+import itertools
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from pois.imports import bump_dataset_version
+from pois.models import Landmark, Poi, PoiLine
+from pois.overpass import AREA_BOUNDING_BOXES, format_bbox, parse_bbox
+from pois.synthetic import CITY_DENSITIES, RoadGrid, city_landmarks, city_pois, route_requests
+
+
+def parse_densities(values: list, scale: float) -> dict:
+    """
+    Parse densities given as category=objects per square kilometer, on top of the defaults.
+    """
+    densities = dict(CITY_DENSITIES)
+    for value in values or []:
+        category, _, density = value.partition("=")
+        if category not in densities:
+            raise CommandError(f"Unknown category: {category}")
+        densities[category] = float(density)
+    return {category: density * scale for category, density in densities.items()}
+
+
+def insert_in_batches(objects, batch_size: int) -> int:
+    """
+    Insert generated points, lines and landmarks in batches, so that memory stays bounded.
+    """
+    inserted = 0
+    while True:
+        batch = list(itertools.islice(objects, batch_size))
+        if not batch:
+            return inserted
+        with transaction.atomic():
+            for model in [Poi, PoiLine, Landmark]:
+                rows = [o for o in batch if type(o) is model]
+                if rows:
+                    model.objects.bulk_create(rows, batch_size=batch_size, ignore_conflicts=model is Landmark)
+        inserted += len(batch)
+        print(f"Inserted {inserted} rows")
+
+
+class Command(BaseCommand):
+    help = """
+    Fill the database with a reproducible, city-scale synthetic dataset of points, lines and landmarks.
+    Lines follow a synthetic street grid and landmarks are clustered, with a realistic mix of types.
+    Optionally, match and landmark requests for synthetic routes on the same grid are written as JSON files.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--bbox",
+            type=str,
+            default=format_bbox(AREA_BOUNDING_BOXES["Hamburg"]),
+            help="The bounding box as (south,west,north,east), Hamburg by default",
+        )
+        parser.add_argument("--seed", type=int, default=0, help="The seed of the synthetic data")
+        parser.add_argument(
+            "--density",
+            type=str,
+            action="append",
+            help="Objects per square kilometer of a category or of the landmarks, e.g. construction=20 or landmark=400",
+        )
+        parser.add_argument("--scale", type=float, default=1, help="Multiply all densities with this factor")
+        parser.add_argument("--road-spacing", type=float, default=150, help="The mean distance between roads in meters")
+        parser.add_argument("--batch-size", type=int, default=10000, help="How many rows are inserted at once")
+        parser.add_argument("--clear", action="store_true", help="Delete all points, lines and landmarks first")
+        parser.add_argument("--routes", type=int, default=0, help="How many synthetic route requests are written")
+        parser.add_argument("--route-length", type=float, default=5000, help="The length of the routes in meters")
+        parser.add_argument("--routes-dir", type=str, default="synthetic-routes", help="Where the route requests are written")
+
+    def handle(self, *args, **options):
+        """
+        Generate the dataset.
+        """
+        densities = parse_densities(options["density"], options["scale"])
+        grid = RoadGrid(parse_bbox(options["bbox"]), options["road_spacing"], options["seed"])
+        print(f"Generating {round(grid.area(), 1)} km² with {len(grid.xs)}x{len(grid.ys)} roads")
+
+        if options["clear"]:
+            print("Clearing database")
+            Poi.objects.all().delete()
+            PoiLine.objects.all().delete()
+            Landmark.objects.all().delete()
+
+        objects = itertools.chain(
+            city_pois(grid, densities, options["seed"]),
+            city_landmarks(grid, densities["landmark"], options["seed"]),
+        )
+        inserted = insert_in_batches(objects, options["batch_size"])
+        print(f"Generated {inserted} rows")
+
+        with connection.cursor() as cursor:
+            for model in [Poi, PoiLine, Landmark]:
+                cursor.execute(f"ANALYZE {connection.ops.quote_name(model._meta.db_table)}")
+        bump_dataset_version()
+
+        if options["routes"]:
+            os.makedirs(options["routes_dir"], exist_ok=True)
+            for index in range(options["routes"]):
+                match_request, landmark_request = route_requests(
+                    grid, options["route_length"], options["seed"], index
+                )
+                files = {
+                    f"route-{index}.json": match_request,
+                    f"route-{index}-instructions.json": landmark_request,
+                }
+                for name, request in files.items():
+                    with open(os.path.join(options["routes_dir"], name), "w") as file:
+                        json.dump(request, file)
+            print(f"Wrote {options['routes']} route requests to {options['routes_dir']}")
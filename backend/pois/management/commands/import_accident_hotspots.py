@@ -1,6 +1,12 @@
 import requests
 from django.contrib.gis.geos import Point
 from django.core.management.base import BaseCommand
+from pois.imports import (
+    add_profiling_arguments,
+    bump_dataset_version,
+    import_stage,
+    profiled_import,
+)
 from pois.models import Poi, PoiLine
 
 
@@ -11,34 +17,40 @@ def import_from_mapdata_service(base_url):
     print(f"Fetching accident hotspots from {API}")
 
     try:
-        response = requests.get(API)
-        response.raise_for_status()
-        data = response.json()
+        with import_stage("fetch"):
+            response = requests.get(API)
+            response.raise_for_status()
+        with import_stage("decode"):
+            data = response.json()
     except Exception as e:
         print("Failed to fetch accident hotspot data: " + str(e))
         return
 
     print(f"Loaded {len(data['features'])} accident hotspots.")
 
-    accident_hotspots = []
-
-    for feature in data["features"]:
-        try:
-            accident_hotspot = Poi(
-                coordinate=Point(
-                    feature["geometry"]["coordinates"][0],
-                    feature["geometry"]["coordinates"][1],
-                    srid=4326,
-                ),
-                category="accidenthotspot",
-            )
-            accident_hotspots.append(accident_hotspot)
-        except Exception as e:
-            print("Failed to create accident hotspot: " + str(e))
-
-    print(f"{len(accident_hotspots)} accident hotspots successfully created.")
-
-    Poi.objects.bulk_create(accident_hotspots)
+    with import_stage("build") as stage:
+        accident_hotspots = []
+
+        for feature in data["features"]:
+            try:
+                accident_hotspot = Poi(
+                    coordinate=Point(
+                        feature["geometry"]["coordinates"][0],
+                        feature["geometry"]["coordinates"][1],
+                        srid=4326,
+                    ),
+                    category="accidenthotspot",
+                )
+                accident_hotspots.append(accident_hotspot)
+            except Exception as e:
+                print("Failed to create accident hotspot: " + str(e))
+
+        print(f"{len(accident_hotspots)} accident hotspots successfully created.")
+        stage["rows"] = len(accident_hotspots)
+
+    with import_stage("insert") as stage:
+        Poi.objects.bulk_create(accident_hotspots)
+        stage["rows"] = len(accident_hotspots)
     print(f"Imported {len(accident_hotspots)} accident hotspots")
 
 
@@ -49,7 +61,9 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument("area", type=str, help="The area to fetch accident hotspot data for")
+        add_profiling_arguments(parser)
 
+    @profiled_import
     def handle(self, *args, **options):
         """
         Fetch accident hotspot data from priobike-map-data.
@@ -76,4 +90,4 @@ class Command(BaseCommand):
         else:
             raise ValueError(f"Unknown area: {area}")
 
-        
\ No newline at end of file
+        bump_dataset_version()
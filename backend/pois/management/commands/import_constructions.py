@@ -1,7 +1,18 @@
 import requests
-from django.contrib.gis.geos import LineString, Point
+from django.contrib.gis.geos import Point
 from django.core.management.base import BaseCommand
+from pois.imports import (
+    add_deduplication_arguments,
+    add_profiling_arguments,
+    add_subdivision_arguments,
+    build_poi_lines,
+    bump_dataset_version,
+    deduplicate_pois,
+    import_stage,
+    profiled_import,
+)
 from pois.models import Poi, PoiLine
+from pois.overpass import AREA_BOUNDING_BOXES, OverpassClient
 
 def import_from_mapdata_service(area):
     print("Importing construction sites data from priobike-map-data")
@@ -17,38 +28,44 @@ def import_from_mapdata_service(area):
     print(f"Fetching construction sites from {API}")
 
     try:
-        response = requests.get(API)
-        response.raise_for_status()
-        data = response.json()
+        with import_stage("fetch"):
+            response = requests.get(API)
+            response.raise_for_status()
+        with import_stage("decode"):
+            data = response.json()
     except Exception as e:
         print("Failed to fetch construction sites data: " + str(e))
         return
 
     print(f"Loaded {len(data['features'])} construction sites.")
 
-    construction_sites = []
-
-    for feature in data["features"]:
-        try:
-            construction_site = Poi(
-                coordinate=Point(
-                    feature["geometry"]["coordinates"][0],
-                    feature["geometry"]["coordinates"][1],
-                    srid=4326,
-                ),
-                category="construction",
-            )
-            construction_sites.append(construction_site)
-        except Exception as e:
-            print("Failed to create construction site: " + str(e))
-
-    print(f"{len(construction_sites)} construction successfully created.")
-
-    Poi.objects.bulk_create(construction_sites)
+    with import_stage("build") as stage:
+        construction_sites = []
+
+        for feature in data["features"]:
+            try:
+                construction_site = Poi(
+                    coordinate=Point(
+                        feature["geometry"]["coordinates"][0],
+                        feature["geometry"]["coordinates"][1],
+                        srid=4326,
+                    ),
+                    category="construction",
+                )
+                construction_sites.append(construction_site)
+            except Exception as e:
+                print("Failed to create construction site: " + str(e))
+
+        print(f"{len(construction_sites)} construction successfully created.")
+        stage["rows"] = len(construction_sites)
+
+    with import_stage("insert") as stage:
+        Poi.objects.bulk_create(construction_sites)
+        stage["rows"] = len(construction_sites)
     print(f"Imported {len(construction_sites)} construction sites")
 
-def import_from_overpass(area):
-    def query(area):
+def import_from_overpass(area, max_line_length=None, max_line_vertices=None, tile_size=0.1):
+    def query(bbox):
         return f"""
             [out:json][timeout:25];
 
@@ -57,8 +74,8 @@ def import_from_overpass(area):
 
             // Search for nodes and ways with the "construction" tag within the defined area
             (
-            node["construction"](area.a);
-            way["construction"](area.a);
+            node["construction"](area.a){bbox};
+            way["construction"](area.a){bbox};
             );
 
             // Output data
@@ -69,40 +86,45 @@ def import_from_overpass(area):
         
     print("Importing construction data from overpass turbo")
 
-    BASE_URL = "overpass-api.de"
-    API = "https://" + BASE_URL + "/api/interpreter"
-    print(f"Fetching construction sites from {API}")
-    DATA = query(area)
-
     try:
-        response = requests.post(API, data=DATA)
-        response.raise_for_status()
-        data = response.json()
+        with OverpassClient() as client, import_stage("fetch"):
+            if area in AREA_BOUNDING_BOXES:
+                data = client.fetch_tiled(query, AREA_BOUNDING_BOXES[area], tile_size)
+            else:
+                print(f"No bounding box known for {area}, fetching without tiles")
+                data = client.fetch(query(""))
     except Exception as e:
         print("Failed to fetch construction data: " + str(e))
         return
     
-    elements_by_id = {element["id"]: element for element in data["elements"]}
-    construction_sites_points = []
-    construction_sites_lines = []
-    for element in data["elements"]:
-        if element["type"] == "node":
-            # Make a point
-            c = Poi(coordinate=Point(element["lon"], element["lat"], srid=4326), category="construction")
-            construction_sites_points.append(c)
-        elif element["type"] == "way":
-            # Make a linestring
-            line = LineString([
-                Point(elements_by_id[node]["lon"], elements_by_id[node]["lat"], srid=4326) 
-                for node in element["nodes"]
-            ])
-            start = Point(elements_by_id[element["nodes"][0]]["lon"], elements_by_id[element["nodes"][0]]["lat"], srid=4326)
-            end = Point(elements_by_id[element["nodes"][-1]]["lon"], elements_by_id[element["nodes"][-1]]["lat"], srid=4326)
-            c = PoiLine(line=line, start=start, end=end, category="construction")
-            construction_sites_lines.append(c)
-
-    Poi.objects.bulk_create(construction_sites_points)
-    PoiLine.objects.bulk_create(construction_sites_lines)
+    with import_stage("build") as stage:
+        elements_by_id = {element["id"]: element for element in data["elements"]}
+        construction_sites_points = []
+        construction_sites_lines = []
+        for element in data["elements"]:
+            if element["type"] == "node":
+                # Make a point
+                c = Poi(coordinate=Point(element["lon"], element["lat"], srid=4326), category="construction")
+                construction_sites_points.append(c)
+            elif element["type"] == "way":
+                # Make a linestring, optionally split into bounded pieces
+                coordinates = [
+                    (elements_by_id[node]["lon"], elements_by_id[node]["lat"])
+                    for node in element["nodes"]
+                ]
+                construction_sites_lines.extend(build_poi_lines(
+                    coordinates,
+                    category="construction",
+                    feature_id=f"way/{element['id']}",
+                    max_length=max_line_length,
+                    max_vertices=max_line_vertices,
+                ))
+        stage["rows"] = len(construction_sites_points) + len(construction_sites_lines)
+
+    with import_stage("insert") as stage:
+        Poi.objects.bulk_create(construction_sites_points)
+        PoiLine.objects.bulk_create(construction_sites_lines)
+        stage["rows"] = len(construction_sites_points) + len(construction_sites_lines)
     print(f"Imported {len(construction_sites_points) + len(construction_sites_lines)} construction sites")
 
 class Command(BaseCommand):
@@ -112,7 +134,12 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument("area", type=str, help="The area to fetch construction data for")
+        add_profiling_arguments(parser)
+        add_subdivision_arguments(parser)
+        add_deduplication_arguments(parser)
+        parser.add_argument("--tile-size", type=float, default=0.1, help="The size of the fetched overpass tiles in degrees")
 
+    @profiled_import
     def handle(self, *args, **options):
         """
         Fetch construction data.
@@ -133,5 +160,12 @@ class Command(BaseCommand):
 
         print("Importing construction data")
         
-        import_from_overpass(area)
-        import_from_mapdata_service(area)
\ No newline at end of file
+        import_from_overpass(area, options["max_line_length"], options["max_line_vertices"], options["tile_size"])
+        import_from_mapdata_service(area)
+
+        # Both sources may contain the same construction sites
+        if options["dedupe_distance"] > 0:
+            with import_stage("dedupe") as stage:
+                stage["rows"] = deduplicate_pois("construction", options["dedupe_distance"])
+
+        bump_dataset_version()
@@ -0,0 +1,101 @@
+import json
+
+from django.conf import settings
+from django.contrib.gis.geos import LineString
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from pois.imports import (
+    add_profiling_arguments,
+    bump_dataset_version,
+    import_stage,
+    profiled_import,
+    snap_to_edges,
+)
+from pois.models import Edge, PoiEdge
+
+
+def build_edges(data: dict) -> list:
+    """
+    Build (unsaved) Edge objects from a GeoJSON FeatureCollection of LineStrings.
+    The id of an edge is the edge_id property of its feature, or else the id of the feature.
+    """
+    edges = []
+    for feature in data["features"]:
+        try:
+            edge_id = feature.get("properties", {}).get("edge_id", feature.get("id"))
+            if edge_id is None or feature["geometry"]["type"] != "LineString":
+                continue
+            edges.append(
+                Edge(
+                    id=int(edge_id),
+                    geometry=LineString(feature["geometry"]["coordinates"], srid=4326),
+                )
+            )
+        except Exception as e:
+            print("Failed to create edge: " + str(e))
+    return edges
+
+
+class Command(BaseCommand):
+    help = """
+    Import the edges of the routing graph from a GeoJSON file, e.g. exported from GraphHopper,
+    and snap all points and lines of points of interest onto them.
+    Match requests that send the edge ids of their route are then answered by a lookup of the edges.
+    Run this (or --snap-only) after the points of interest were imported.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "edges",
+            type=str,
+            nargs="?",
+            help="A GeoJSON FeatureCollection of edge LineStrings with an edge_id property",
+        )
+        parser.add_argument(
+            "--snap-threshold",
+            type=float,
+            default=settings.EDGE_SNAP_THRESHOLD,
+            help="Snap points of interest onto edges within this distance in meters, "
+            "categories with a larger threshold are matched geometrically",
+        )
+        parser.add_argument(
+            "--snap-only",
+            action="store_true",
+            help="Keep the imported edges and only snap the points of interest onto them again",
+        )
+        parser.add_argument("--batch-size", type=int, default=10000, help="How many edges are inserted at once")
+        add_profiling_arguments(parser)
+
+    @profiled_import
+    def handle(self, *args, **options):
+        """
+        Import the edges and snap the points of interest onto them.
+        """
+        if not options["snap_only"]:
+            if not options["edges"]:
+                raise CommandError("An edges file is required, unless --snap-only is given")
+
+            with import_stage("decode"):
+                with open(options["edges"], "r") as file:
+                    data = json.load(file)
+
+            with import_stage("build") as stage:
+                edges = build_edges(data)
+                stage["rows"] = len(edges)
+            print(f"{len(edges)} edges successfully created.")
+
+            print("Clearing edges")
+            # Deleting through the ORM would collect the snapped pois of every edge in Python
+            edge_table = connection.ops.quote_name(Edge._meta.db_table)
+            poi_edge_table = connection.ops.quote_name(PoiEdge._meta.db_table)
+            with connection.cursor() as cursor:
+                cursor.execute(f"TRUNCATE {poi_edge_table}, {edge_table}")
+
+            with import_stage("insert") as stage:
+                Edge.objects.bulk_create(edges, batch_size=options["batch_size"])
+                stage["rows"] = len(edges)
+            print(f"Imported {len(edges)} edges")
+
+        snap_to_edges(options["snap_threshold"])
+        # The points of interest were just snapped
+        bump_dataset_version(pois_changed=False)
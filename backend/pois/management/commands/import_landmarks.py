@@ -1,9 +1,15 @@
 import json
 
-import requests
 from django.contrib.gis.geos import Point
 from django.core.management.base import BaseCommand
+from pois.imports import (
+    add_profiling_arguments,
+    bump_dataset_version,
+    import_stage,
+    profiled_import,
+)
 from pois.models import Landmark
+from pois.overpass import OverpassClient, decode_response, merge_elements, parse_bbox
 
 translation_table: dict = {}
 unknown_tags: set = set()
@@ -80,9 +86,11 @@ def build_overpass_query(bounding_box: str) -> str:
     return full_query
 
 
-def import_from_overpass(bounding_box: str):
+def import_from_overpass(bounding_box: str, tile_size: float = 0.1):
     """
-    Import landmark data from the overpass API.
+    Fetch landmark data from the overpass API and build (unsaved) Landmark objects.
+    The bounding box is fetched in tiles of the given size in degrees.
+    Returns None if the fetch failed or no landmarks were found.
     """
 
     global OSM_CATEGORIES
@@ -90,81 +98,88 @@ def import_from_overpass(bounding_box: str):
 
     print("Importing landmark data from overpass turbo")
 
-    query: str = build_overpass_query(bounding_box)
-    API = "https://overpass-api.de/api/interpreter"
-
     try:
-        response = requests.get(API, params={"data": query})
-        response.raise_for_status()
-        data = response.json()
+        with OverpassClient() as client, import_stage("fetch"):
+            contents = client.fetch_tiles(
+                build_overpass_query, parse_bbox(bounding_box), tile_size
+            )
+        with import_stage("decode"):
+            data = merge_elements([decode_response(content) for content in contents])
     except Exception as e:
         print("Failed to fetch landmark data: " + str(e))
-        return
+        return None
 
     print(f"Fetched {len(data['elements'])} elements.")
 
-    landmark_points = []
-    for element in data["elements"]:
-        # There should not be any other types than nodes in the response
-        if element["type"] != "node":
-            print("Found unknown element type: " + element["type"])
-            continue
-
-        assert element["id"] is not None, "Element id is required"
-
-        # There is no easy way to determine the type of landmark from the data
-        # There is a tagging system, but it is not used consistently, therefore I try to create a hierarchy of usefull tags
-
-        # Data structure:
-        # type = i.e. "Kino"
-        # category = i.e. "amenity" (the category used by openstreetmap/overpass)
-
-        # Always preferentially use the name tag as type
-        if "name" in element["tags"]:
-            name = element["tags"]["name"]
-        else:
-            name = ""
-
-        for category in OSM_CATEGORIES:
-            if category in element["tags"]:
-                type = translate_tag(category, element["tags"][category])
-                category = translate_tag(category, "")
-                break
-
-        if not category or not type:
-            type = "Landmarke"
-            category = "Landmarke"
-
-            # Print debug message if no category was found
-            tags = ""
-            for key in element["tags"]:
-                tags += key + " = " + element["tags"][key] + ","
-            print(
-                "No category found for element with id",
-                str(element["id"]),
-                "and tags '" + tags + "' using default category",
-            )
+    with import_stage("translate") as stage:
+        # The name, type and category of each element, as (element, name, type, category)
+        classified = []
+        for element in data["elements"]:
+            # There should not be any other types than nodes in the response
+            if element["type"] != "node":
+                print("Found unknown element type: " + element["type"])
+                continue
+
+            assert element["id"] is not None, "Element id is required"
+
+            # There is no easy way to determine the type of landmark from the data
+            # There is a tagging system, but it is not used consistently, therefore I try to create a hierarchy of usefull tags
+
+            # Data structure:
+            # type = i.e. "Kino"
+            # category = i.e. "amenity" (the category used by openstreetmap/overpass)
+
+            # Always preferentially use the name tag as type
+            if "name" in element["tags"]:
+                name = element["tags"]["name"]
+            else:
+                name = ""
+
+            for category in OSM_CATEGORIES:
+                if category in element["tags"]:
+                    type = translate_tag(category, element["tags"][category])
+                    category = translate_tag(category, "")
+                    break
+
+            if not category or not type:
+                type = "Landmarke"
+                category = "Landmarke"
+
+                # Print debug message if no category was found
+                tags = ""
+                for key in element["tags"]:
+                    tags += key + " = " + element["tags"][key] + ","
+                print(
+                    "No category found for element with id",
+                    str(element["id"]),
+                    "and tags '" + tags + "' using default category",
+                )
 
-        if type in BLACKLIST:
-            continue
-
-        # Create a Landmark object
-        landmark = Landmark(
-            id=element["id"],
-            name=name,
-            coordinate=Point(element["lon"], element["lat"], srid=4326),
-            type=type,
-            category=category,
-            tags=json.dumps(element["tags"]),
-        )
-        landmark_points.append(landmark)
+            if type in BLACKLIST:
+                continue
+
+            classified.append((element, name, type, category))
+        stage["rows"] = len(classified)
+
+    with import_stage("build") as stage:
+        landmark_points = [
+            Landmark(
+                id=element["id"],
+                name=name,
+                coordinate=Point(element["lon"], element["lat"], srid=4326),
+                type=type,
+                category=category,
+                tags=json.dumps(element["tags"]),
+            )
+            for element, name, type, category in classified
+        ]
+        stage["rows"] = len(landmark_points)
 
     if len(landmark_points) == 0:
         print("ERROR: No landmarks found in the data")
-        return
+        return None
 
-    Landmark.objects.bulk_create(landmark_points)
-    print(f"Imported {len(landmark_points)} landmarks")
+    return landmark_points
 
 
 def translate_tag(category: str, tag: str) -> str:
@@ -211,7 +226,15 @@ class Command(BaseCommand):
         parser.add_argument(
             "area", type=str, help="The area to fetch landmark data for"
         )
+        add_profiling_arguments(parser)
+        parser.add_argument(
+            "--tile-size",
+            type=float,
+            default=0.1,
+            help="The size of the fetched overpass tiles in degrees",
+        )
 
+    @profiled_import
     def handle(self, *args, **options):
         """
         Fetch landmark data.
@@ -231,14 +254,6 @@ class Command(BaseCommand):
         # area = options["area"]
         # assert area, "Area is required"
 
-        print("Clearing database")
-
-        try:
-            Landmark.objects.all().delete()
-        except Exception as e:
-            print("Failed to delete existing landmarks: " + str(e))
-            return
-
         global translation_table
 
         # load translation table for osm tags
@@ -248,7 +263,27 @@ class Command(BaseCommand):
 
         assert translation_table, "Translation table is empty"
 
-        import_from_overpass(bounding_box)
+        landmark_points = import_from_overpass(bounding_box, options["tile_size"])
+        if landmark_points is None:
+            # Keep the existing landmarks and the dataset version
+            print("Aborting the import, the existing landmarks are kept")
+            return
+
+        print("Clearing database")
+
+        try:
+            Landmark.objects.all().delete()
+        except Exception as e:
+            print("Failed to delete existing landmarks: " + str(e))
+            return
+
+        with import_stage("insert") as stage:
+            Landmark.objects.bulk_create(landmark_points)
+            stage["rows"] = len(landmark_points)
+        print(f"Imported {len(landmark_points)} landmarks")
+
+        # Landmarks are not snapped onto edges
+        bump_dataset_version(pois_changed=False)
 
         print(
             "Unknown OSM tags: "
@@ -1,45 +1,59 @@
 import requests
-from django.contrib.gis.geos import LineString, Point
 from django.core.management.base import BaseCommand
+from pois.imports import (
+    add_profiling_arguments,
+    add_subdivision_arguments,
+    build_poi_lines,
+    bump_dataset_version,
+    import_stage,
+    profiled_import,
+)
 from pois.models import Poi, PoiLine
 
 
-def import_from_mapdata_service(base_url):
+def import_from_mapdata_service(base_url, max_line_length=None, max_line_vertices=None):
     print("Importing velo route data from priobike-map-data")
 
     API = f"https://{base_url}/map-data/velo_routes_v2.geojson"
     print(f"Fetching velo routes from {API}")
 
     try:
-        response = requests.get(API)
-        response.raise_for_status()
-        data = response.json()
+        with import_stage("fetch"):
+            response = requests.get(API)
+            response.raise_for_status()
+        with import_stage("decode"):
+            data = response.json()
     except Exception as e:
         print("Failed to fetch velo route data: " + str(e))
         return
 
     print(f"Loaded {len(data['features'])} velo routes.")
 
-    velo_routes = []
-
-    for feature in data["features"]:
-        assert feature["geometry"]["type"] == "LineString"
-        try:
-            line = LineString(feature["geometry"]["coordinates"], srid=4326)
-            start = Point(feature["geometry"]["coordinates"][0], srid=4326)
-            end = Point(feature["geometry"]["coordinates"][-1], srid=4326)
-            velo_route = PoiLine(
-                line=line, start=start, end=end,
-                category="veloroute",
-            )
-            velo_routes.append(velo_route)
-        except Exception as e:
-            print("Failed to create velo route: " + str(e))
-
-    print(f"{len(velo_routes)} velo routes successfully created.")
-
-    PoiLine.objects.bulk_create(velo_routes)
-    print(f"Imported {len(velo_routes)} velo routes")
+    with import_stage("build") as stage:
+        velo_routes = []
+
+        for index, feature in enumerate(data["features"]):
+            assert feature["geometry"]["type"] == "LineString"
+            try:
+                feature_id = str(feature.get("id", f"veloroute/{index}"))
+                velo_route_pieces = build_poi_lines(
+                    feature["geometry"]["coordinates"],
+                    category="veloroute",
+                    feature_id=feature_id,
+                    max_length=max_line_length,
+                    max_vertices=max_line_vertices,
+                )
+                velo_routes.extend(velo_route_pieces)
+            except Exception as e:
+                print("Failed to create velo route: " + str(e))
+
+        print(f"{len(velo_routes)} velo route pieces successfully created.")
+        stage["rows"] = len(velo_routes)
+
+    with import_stage("insert") as stage:
+        PoiLine.objects.bulk_create(velo_routes)
+        stage["rows"] = len(velo_routes)
+    print(f"Imported {len(velo_routes)} velo route pieces")
 
 
 class Command(BaseCommand):
@@ -49,7 +63,10 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument("area", type=str, help="The area to fetch velo route data for")
+        add_profiling_arguments(parser)
+        add_subdivision_arguments(parser)
 
+    @profiled_import
     def handle(self, *args, **options):
         """
         Fetch velo route data from priobike-map-data.
@@ -69,11 +86,14 @@ class Command(BaseCommand):
             print("Failed to delete existing velo routes: " + str(e))
             return
         
+        max_line_length = options["max_line_length"]
+        max_line_vertices = options["max_line_vertices"]
+
         if area == "Dresden":
-            import_from_mapdata_service("priobike.vkw.tu-dresden.de/staging")
+            import_from_mapdata_service("priobike.vkw.tu-dresden.de/staging", max_line_length, max_line_vertices)
         elif area == "Hamburg":
-            import_from_mapdata_service("priobike.vkw.tu-dresden.de/production")
+            import_from_mapdata_service("priobike.vkw.tu-dresden.de/production", max_line_length, max_line_vertices)
         else:
             raise ValueError(f"Unknown area: {area}")
 
-        
\ No newline at end of file
+        bump_dataset_version()
@@ -0,0 +1,186 @@
+import itertools
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+
+def load_corpus(paths: list) -> list:
+    """
+    Load recorded requests from JSON files or directories of JSON files.
+    A file contains a recorded request {"endpoint": ..., "query": {...}, "body": {...}}, a list of them,
+    or a plain request body, like the bundled example-route*.json and example-gh-instruction.json files.
+    """
+    files = []
+    for path in paths:
+        path = Path(path)
+        files.extend(sorted(path.glob("*.json")) if path.is_dir() else [path])
+
+    corpus = []
+    for file in files:
+        with open(file, "r") as f:
+            data = json.load(f)
+        for record in data if isinstance(data, list) else [data]:
+            if "endpoint" in record:
+                corpus.append(
+                    {
+                        "endpoint": record["endpoint"],
+                        "query": record.get("query", {}),
+                        "body": record["body"],
+                    }
+                )
+            elif "route" in record:
+                corpus.append({"endpoint": "/pois/match", "query": {}, "body": record})
+            elif "points" in record and "instructions" in record:
+                corpus.append({"endpoint": "/pois/landmarks", "query": {}, "body": record})
+            else:
+                print(f"Skipping unknown request in {file}")
+    return corpus
+
+
+def percentile(values: list, fraction: float) -> float:
+    """
+    Get a percentile of sorted values.
+    """
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def latency_summary(latencies: list) -> dict:
+    """
+    Summarize latencies as percentiles.
+    """
+    latencies = sorted(latencies)
+    return {
+        "p50": percentile(latencies, 0.5),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "max": latencies[-1] if latencies else None,
+    }
+
+
+def summarize(samples: list, duration: float) -> dict:
+    """
+    Summarize (status, latency, response time) samples as throughput, latency percentiles in milliseconds and error rate.
+    The latency is measured from when a request was sent. The response time is measured from when it was due
+    at the given rate, so that it includes the time that requests waited for a slow server (coordinated omission).
+    """
+    errors = sum(1 for status, _, _ in samples if status is None or status >= 400)
+    statuses = {}
+    for status, _, _ in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    summary = {
+        "requests": len(samples),
+        "throughput": round(len(samples) / duration, 2) if duration > 0 else None,
+        "error_rate": round(errors / len(samples), 4) if samples else None,
+        "statuses": statuses,
+        "latency_ms": latency_summary([latency for _, latency, _ in samples]),
+    }
+    response_times = [response_time for _, _, response_time in samples if response_time is not None]
+    if response_times:
+        summary["response_time_ms"] = latency_summary(response_times)
+    return summary
+
+
+class Command(BaseCommand):
+    help = """
+    Replay recorded match and landmark requests against a running instance, at a given concurrency and rate.
+    Reports throughput, latency percentiles and error rates, overall and per endpoint, as JSON.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("corpus", nargs="+", type=str, help="JSON files or directories with recorded requests")
+        parser.add_argument("--url", type=str, default="http://localhost:8000", help="The base url of the instance")
+        parser.add_argument("--concurrency", type=int, default=4, help="How many requests are sent at the same time")
+        parser.add_argument("--rate", type=float, default=0, help="Requests per second in total (0 means as fast as possible)")
+        parser.add_argument("--requests", type=int, default=None, help="How many requests are sent, cycling through the corpus")
+        parser.add_argument("--duration", type=float, default=None, help="For how many seconds requests are sent")
+        parser.add_argument("--timeout", type=float, default=30, help="The timeout of a request in seconds")
+        parser.add_argument("--output", type=str, default=None, help="Write the report into this file")
+
+    def handle(self, *args, **options):
+        """
+        Replay the requests.
+        """
+        corpus = load_corpus(options["corpus"])
+        if not corpus:
+            raise CommandError("No requests found in the corpus")
+        total = options["requests"]
+        if total is None and options["duration"] is None:
+            total = len(corpus)
+
+        base_url = options["url"].rstrip("/")
+        rate = options["rate"]
+        counter = itertools.count()
+        counter_lock = threading.Lock()
+        samples = {}
+        samples_lock = threading.Lock()
+        local = threading.local()
+        start = time.monotonic()
+
+        def next_request():
+            """
+            Get the number of the next request and when it is due, or None if the replay is done.
+            Waits until the request is due, if a rate is given.
+            """
+            with counter_lock:
+                number = next(counter)
+            if total is not None and number >= total:
+                return None
+            due = None
+            if rate > 0:
+                due = start + number / rate
+                delay = due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            if options["duration"] is not None and time.monotonic() - start > options["duration"]:
+                return None
+            return number, due
+
+        def worker():
+            local.session = requests.Session()
+            while (scheduled := next_request()) is not None:
+                number, due = scheduled
+                request = corpus[number % len(corpus)]
+                sent = time.perf_counter()
+                try:
+                    response = local.session.post(
+                        base_url + request["endpoint"],
+                        params=request["query"],
+                        json=request["body"],
+                        timeout=options["timeout"],
+                    )
+                    status = response.status_code
+                except requests.RequestException:
+                    status = None
+                latency = round((time.perf_counter() - sent) * 1000, 3)
+                # Requests that were sent late, because all workers waited for the server, count from when they were due
+                response_time = round((time.monotonic() - due) * 1000, 3) if due is not None else None
+                with samples_lock:
+                    samples.setdefault(request["endpoint"], []).append((status, latency, response_time))
+
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as executor:
+            for future in [executor.submit(worker) for _ in range(options["concurrency"])]:
+                future.result()
+        duration = time.monotonic() - start
+
+        report = {
+            "url": base_url,
+            "concurrency": options["concurrency"],
+            "rate": rate,
+            "duration": round(duration, 3),
+            "total": summarize([s for endpoint in samples.values() for s in endpoint], duration),
+            "endpoints": {
+                endpoint: summarize(endpoint_samples, duration)
+                for endpoint, endpoint_samples in sorted(samples.items())
+            },
+        }
+        print(json.dumps(report, indent=2))
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                json.dump(report, file, indent=2)
@@ -0,0 +1,197 @@
+import math
+
+from django.contrib.gis.geos import LineString
+from pois.geometry import cumulative_lengths
+from pois.projection import LocalProjection
+from pois.timing import span
+
+
+class RouteContext:
+    """
+    A route that is prepared once for matching all poi categories.
+    Holds the route in lon/lat and in a local projection in meters around the route,
+    its projected vertices and the distance along the route to each of them.
+    A given projection is used instead, so that distances along several routes are comparable.
+    """
+
+    def __init__(self, route_linestring: LineString, projection: LocalProjection = None):
+        self.linestring = route_linestring
+        self.wkb = bytes(route_linestring.wkb)
+        with span("transform"):
+            self.projection = projection or LocalProjection.around(route_linestring.coords)
+            self.coords = self.projection.forward(route_linestring.coords)
+            self.projected = LineString(self.coords)
+        self.cumulative = cumulative_lengths(self.coords, math.dist)
+        self.length = self.cumulative[-1]
+        self.corridors = {}
+
+    def corridor(self, threshold: float) -> tuple:
+        """
+        Get the projected route buffered by the threshold, and the buffer as a prepared geometry.
+        The prepared geometry makes repeated intersects and covers tests against the buffer cheap.
+        """
+        if threshold not in self.corridors:
+            buffered = self.projected.buffer(threshold)
+            self.corridors[threshold] = (buffered, buffered.prepared)
+        return self.corridors[threshold]
+
+
+def sweep_segments(context: RouteContext, segments_by_category: dict) -> dict:
+    """
+    Convert the merged segments of each category, given as distances along the route, to lists of [lon, lat] coordinates.
+    All categories are converted in one traversal of the route vertices, and all points are transformed back to lon/lat at once.
+    A segment starts and ends at its interpolated distances and contains the route vertices in between.
+    """
+    coords = context.coords
+    cumulative = context.cumulative
+    last_edge = len(coords) - 2
+
+    # The projected segments of each category
+    projected = {category: [] for category in segments_by_category}
+    # Per category that has segments left: the index of the next segment and the running segment
+    states = {
+        category: [0, None] for category, segments in segments_by_category.items() if segments
+    }
+
+    for i in range(last_edge + 1):
+        if not states:
+            break  # Projected all segments
+        from_coord = coords[i]
+        to_coord = coords[i + 1]
+        a = cumulative[i]
+        # Distances beyond the last vertex (rounding) end on the last edge
+        b = cumulative[i + 1] if i < last_edge else math.inf
+        edge_length = cumulative[i + 1] - a
+
+        def interpolate(distance):
+            fraction = min(1, max(0, distance - a) / edge_length) if edge_length > 0 else 0
+            return (
+                from_coord[0] + (to_coord[0] - from_coord[0]) * fraction,
+                from_coord[1] + (to_coord[1] - from_coord[1]) * fraction,
+            )
+
+        for category in list(states):
+            state = states[category]
+            segments = segments_by_category[category]
+            while state[0] < len(segments):
+                x, y = segments[state[0]]
+                if state[1] is None:
+                    if x > b:
+                        break  # Starts on a later edge
+                    if y <= b:
+                        # The whole segment is on this edge
+                        # Segment:   x--y
+                        # Route:    a----b
+                        projected[category].append([interpolate(x), interpolate(y)])
+                        state[0] += 1
+                        continue
+                    # Entered a new segment
+                    # Segment:   x--
+                    # Route:   a---b
+                    state[1] = [interpolate(x), to_coord]
+                    break
+                if y <= b:
+                    # Exited the running segment
+                    # Segment:   --y
+                    # Route:     a---b
+                    state[1].extend([from_coord, interpolate(y)])
+                    projected[category].append(state[1])
+                    state[1] = None
+                    state[0] += 1
+                    continue
+                # Inside the running segment
+                # Segment: x-------y
+                # Route:     a---b
+                state[1].extend([from_coord, to_coord])
+                break
+            if state[0] >= len(segments):
+                del states[category]
+
+    # Transform all points back to lonlat at once
+    points = [point for segments in projected.values() for segment in segments for point in segment]
+    if not points:
+        return projected
+    points_lonlat = iter(context.projection.inverse(points))
+    return {
+        category: [[list(next(points_lonlat)) for _ in segment] for segment in segments]
+        for category, segments in projected.items()
+    }
+
+
+# How many parts of a route with unknown edges are matched geometrically on their own,
+# routes with more parts are matched geometrically as a whole
+MAX_UNKNOWN_PARTS = 4
+
+
+def locate_on_route(context: RouteContext, x: float, y: float, first: int, last: int) -> tuple:
+    """
+    Locate a projected point on the part of the route between two vertices.
+    Returns the distance along the route to the closest location in meters, and the distance of the point to it.
+    """
+    coords = context.coords
+    cumulative = context.cumulative
+    best_along = cumulative[first]
+    best_offset = math.dist((x, y), coords[first])
+    for i in range(first, last):
+        (ax, ay), (bx, by) = coords[i], coords[i + 1]
+        dx, dy = bx - ax, by - ay
+        length2 = dx * dx + dy * dy
+        fraction = min(1, max(0, ((x - ax) * dx + (y - ay) * dy) / length2)) if length2 > 0 else 0
+        offset = math.hypot(x - ax - fraction * dx, y - ay - fraction * dy)
+        if offset < best_offset:
+            best_offset = offset
+            best_along = cumulative[i] + fraction * (cumulative[i + 1] - cumulative[i])
+    return best_along, best_offset
+
+
+def match_edges(context: RouteContext, edge_ids: list, rows: list, config: dict) -> tuple:
+    """
+    Make segments around the points of interest that were snapped onto the edges of the route, by the ids of the edges.
+    The edge ids are [first vertex, last vertex, edge id] intervals of the route, like the edge_id path details of GraphHopper.
+    The rows are those of the match_edges statement, and the config the (threshold, elongation) by category.
+    Returns the unmerged segments by category, and the [first, last] vertices of the route parts without known edges.
+    """
+    snapped = {}
+    for edge_id, category, *poi in rows:
+        pois = snapped.setdefault(edge_id, [])
+        if category is not None:
+            pois.append((category, *poi))
+
+    projection = context.projection
+    route_length = context.length
+    segments = {category: [] for category in config}
+    # If each edge of the route is covered by a known edge of the routing graph
+    covered = [False] * (len(context.coords) - 1)
+    for first, last, edge_id in edge_ids:
+        pois = snapped.get(edge_id)
+        if pois is None:
+            continue  # Unknown edge
+        covered[first:last] = [True] * (last - first)
+        for category, is_line, start_lon, start_lat, end_lon, end_lat, distance in pois:
+            threshold, elongation = config[category]
+            if distance > threshold:
+                continue
+            (start_x, start_y), (end_x, end_y) = projection.forward(
+                [(start_lon, start_lat), (end_lon, end_lat)]
+            )
+            # The route may only cover a part of the edge, at its start and end
+            start, start_offset = locate_on_route(context, start_x, start_y, first, last)
+            if not is_line:
+                if start_offset + distance <= threshold:
+                    segments[category].append(
+                        [max(0, start - elongation), min(route_length, start + elongation)]
+                    )
+                continue
+            end, end_offset = locate_on_route(context, end_x, end_y, first, last)
+            if min(start_offset, end_offset) + distance <= threshold:
+                segments[category].append([min(start, end), max(start, end)])
+
+    unknown = []
+    for i, is_covered in enumerate(covered):
+        if is_covered:
+            continue
+        if unknown and unknown[-1][1] == i:
+            unknown[-1][1] = i + 1
+        else:
+            unknown.append([i, i + 1])
+    return segments, unknown
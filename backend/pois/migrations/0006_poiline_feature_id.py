@@ -0,0 +1,18 @@
+# Generated by Django 5.0.4 on 2026-10-19 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pois', '0005_landmark_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='poiline',
+            name='feature_id',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
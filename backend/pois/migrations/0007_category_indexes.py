@@ -0,0 +1,54 @@
+# Generated by Django 5.0.4 on 2026-10-19 10:00
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pois', '0006_poiline_feature_id'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='poi',
+            index=models.Index(fields=['category'], name='poi_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='poi',
+            index=django.contrib.postgres.indexes.GistIndex(condition=models.Q(('category', 'construction')), fields=['coordinate'], name='poi_construction_gist'),
+        ),
+        migrations.AddIndex(
+            model_name='poi',
+            index=django.contrib.postgres.indexes.GistIndex(condition=models.Q(('category', 'accidenthotspot')), fields=['coordinate'], name='poi_accidenthotspot_gist'),
+        ),
+        migrations.AddIndex(
+            model_name='poi',
+            index=django.contrib.postgres.indexes.GistIndex(condition=models.Q(('category', 'greenwave')), fields=['coordinate'], name='poi_greenwave_gist'),
+        ),
+        migrations.AddIndex(
+            model_name='poi',
+            index=django.contrib.postgres.indexes.GistIndex(condition=models.Q(('category', 'veloroute')), fields=['coordinate'], name='poi_veloroute_gist'),
+        ),
+        migrations.AddIndex(
+            model_name='poiline',
+            index=models.Index(fields=['category'], name='poiline_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='poiline',
+            index=django.contrib.postgres.indexes.GistIndex(condition=models.Q(('category', 'construction')), fields=['line'], name='poiline_construction_gist'),
+        ),
+        migrations.AddIndex(
+            model_name='poiline',
+            index=django.contrib.postgres.indexes.GistIndex(condition=models.Q(('category', 'accidenthotspot')), fields=['line'], name='poiline_accidenthotspot_gist'),
+        ),
+        migrations.AddIndex(
+            model_name='poiline',
+            index=django.contrib.postgres.indexes.GistIndex(condition=models.Q(('category', 'greenwave')), fields=['line'], name='poiline_greenwave_gist'),
+        ),
+        migrations.AddIndex(
+            model_name='poiline',
+            index=django.contrib.postgres.indexes.GistIndex(condition=models.Q(('category', 'veloroute')), fields=['line'], name='poiline_veloroute_gist'),
+        ),
+    ]
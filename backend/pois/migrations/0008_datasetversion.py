@@ -0,0 +1,25 @@
+# Generated by Django 5.0.4 on 2026-10-19 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pois', '0007_category_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DatasetVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Dataset version',
+                'verbose_name_plural': 'Dataset versions',
+            },
+        ),
+    ]
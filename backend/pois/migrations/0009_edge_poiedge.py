@@ -0,0 +1,42 @@
+# Generated by Django 5.0.4 on 2026-10-19 14:00
+
+import django.contrib.gis.db.models.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pois', '0008_datasetversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Edge',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('geometry', django.contrib.gis.db.models.fields.LineStringField(geography=True, srid=4326)),
+            ],
+            options={
+                'verbose_name': 'Edge',
+                'verbose_name_plural': 'Edges',
+            },
+        ),
+        migrations.CreateModel(
+            name='PoiEdge',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.TextField()),
+                ('is_line', models.BooleanField(default=False)),
+                ('start', django.contrib.gis.db.models.fields.PointField(geography=True, srid=4326)),
+                ('end', django.contrib.gis.db.models.fields.PointField(geography=True, srid=4326)),
+                ('distance', models.FloatField()),
+                ('edge', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pois', to='pois.edge')),
+            ],
+            options={
+                'verbose_name': 'Point of interest on an edge',
+                'verbose_name_plural': 'Points of interest on edges',
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.0.4 on 2026-10-19 16:00
+
+from django.core.management import call_command
+from django.db import migrations
+
+
+def create_cache_tables(apps, schema_editor):
+    """
+    Create the table of the match session cache, which all worker processes share.
+    """
+    call_command("createcachetable", database=schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pois', '0009_edge_poiedge'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_tables, migrations.RunPython.noop),
+    ]
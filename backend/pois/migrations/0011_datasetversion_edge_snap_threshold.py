@@ -0,0 +1,18 @@
+# Generated by Django 5.0.4 on 2026-10-19 17:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pois', '0010_match_sessions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datasetversion',
+            name='edge_snap_threshold',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
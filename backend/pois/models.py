@@ -1,5 +1,14 @@
 from django.conf import settings
 from django.contrib.gis.db import models
+from django.contrib.postgres.indexes import GistIndex
+
+# The categories of points of interest that are matched along routes.
+POI_CATEGORIES = [
+    "construction",
+    "accidenthotspot",
+    "greenwave",
+    "veloroute",
+]
 
 
 class Poi(models.Model):
@@ -17,6 +26,15 @@ class Poi(models.Model):
     class Meta:
         verbose_name = "Point of interest"
         verbose_name_plural = "Points of interest"
+        # Every query filters by category, so each category gets its own spatial index
+        indexes = [models.Index(fields=["category"], name="poi_category_idx")] + [
+            GistIndex(
+                fields=["coordinate"],
+                condition=models.Q(category=category),
+                name=f"poi_{category}_gist",
+            )
+            for category in POI_CATEGORIES
+        ]
 
 
 class PoiLine(models.Model):
@@ -34,12 +52,24 @@ class PoiLine(models.Model):
     # The end point of the line
     end = models.PointField(srid=settings.LONLAT, geography=True)
 
+    # The id of the original feature, if the line is a piece of a subdivided feature.
+    feature_id = models.TextField(blank=True, default="")
+
     def __str__(self) -> str:
         return f"{self.category} along {self.line}"
 
     class Meta:
         verbose_name = "Line of points of interest"
         verbose_name_plural = "Lines of points of interest"
+        # Every query filters by category, so each category gets its own spatial index
+        indexes = [models.Index(fields=["category"], name="poiline_category_idx")] + [
+            GistIndex(
+                fields=["line"],
+                condition=models.Q(category=category),
+                name=f"poiline_{category}_gist",
+            )
+            for category in POI_CATEGORIES
+        ]
 
 
 class Landmark(models.Model):
@@ -70,3 +100,69 @@ class Landmark(models.Model):
     class Meta:
         verbose_name = "Landmark"
         verbose_name_plural = "Landmarks"
+
+
+class Edge(models.Model):
+    """An edge of the routing graph, e.g. of GraphHopper."""
+
+    # The id of the edge in the routing graph.
+    id = models.BigIntegerField(primary_key=True)
+
+    # The geometry of the edge.
+    geometry = models.LineStringField(srid=settings.LONLAT, geography=True)
+
+    def __str__(self) -> str:
+        return f"Edge {self.id}"
+
+    class Meta:
+        verbose_name = "Edge"
+        verbose_name_plural = "Edges"
+
+
+class PoiEdge(models.Model):
+    """A point or line of points of interest, snapped onto an edge of the routing graph."""
+
+    # The edge that the point of interest was snapped onto.
+    edge = models.ForeignKey(Edge, on_delete=models.CASCADE, related_name="pois")
+
+    # The kind of point of interest.
+    category = models.TextField()
+
+    # If this is a piece of a line of points of interest, otherwise a point.
+    is_line = models.BooleanField(default=False)
+
+    # Where the point, or the start of the line piece, lies on the edge.
+    start = models.PointField(srid=settings.LONLAT, geography=True)
+
+    # Where the end of the line piece lies on the edge, the same as start for points.
+    end = models.PointField(srid=settings.LONLAT, geography=True)
+
+    # The distance of the point of interest to the edge, in meters.
+    distance = models.FloatField()
+
+    def __str__(self) -> str:
+        return f"{self.category} on edge {self.edge_id}"
+
+    class Meta:
+        verbose_name = "Point of interest on an edge"
+        verbose_name_plural = "Points of interest on edges"
+
+
+class DatasetVersion(models.Model):
+    """The version of the imported data, bumped by every import."""
+
+    # Increases with every import.
+    version = models.BigIntegerField(default=0)
+
+    # When the data was last imported.
+    updated = models.DateTimeField(auto_now=True)
+
+    # The threshold in meters the points of interest were snapped onto edges with, or null if they were never snapped.
+    edge_snap_threshold = models.FloatField(null=True, blank=True)
+
+    def __str__(self) -> str:
+        return f"Dataset version {self.version} from {self.updated}"
+
+    class Meta:
+        verbose_name = "Dataset version"
+        verbose_name_plural = "Dataset versions"
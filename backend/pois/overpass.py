@@ -0,0 +1,163 @@
+import json
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# The bounding boxes (south, west, north, east) of the supported areas
+AREA_BOUNDING_BOXES = {
+    "Hamburg": (53.35, 9.65, 53.75, 10.4),
+    "Dresden": (50.9, 13.5, 51.2, 14.0),
+}
+
+
+class OverpassError(Exception):
+    """Raised when the overpass API could not answer a query."""
+
+
+def format_bbox(bbox) -> str:
+    """
+    Format a bounding box (south, west, north, east) as an overpass filter, e.g. "(50.9,13.5,51.2,14.0)".
+    """
+    return "(" + ",".join(str(value) for value in bbox) + ")"
+
+
+def parse_bbox(bbox: str) -> tuple:
+    """
+    Parse a bounding box given as an overpass filter, e.g. "(50.9,13.5,51.2,14.0)".
+    """
+    south, west, north, east = (float(value) for value in bbox.strip("() ").split(","))
+    assert south < north and west < east, "Invalid bounding box"
+    return south, west, north, east
+
+
+def split_bbox(bbox, tile_size: float) -> list:
+    """
+    Split a bounding box (south, west, north, east) into tiles of at most tile_size degrees per side.
+    """
+    assert tile_size > 0, "Tile size must be positive"
+    south, west, north, east = bbox
+    rows = max(1, math.ceil(round((north - south) / tile_size, 9)))
+    cols = max(1, math.ceil(round((east - west) / tile_size, 9)))
+    lat_step = (north - south) / rows
+    lon_step = (east - west) / cols
+    tiles = []
+    for row in range(rows):
+        for col in range(cols):
+            tiles.append(
+                (
+                    round(south + row * lat_step, 7),
+                    round(west + col * lon_step, 7),
+                    round(south + (row + 1) * lat_step, 7),
+                    round(west + (col + 1) * lon_step, 7),
+                )
+            )
+    return tiles
+
+
+class OverpassClient:
+    """
+    Fetch data from an overpass API in tiles.
+    The tiles are fetched concurrently through one pooled session that retries failed requests with backoff.
+    """
+
+    def __init__(
+        self,
+        url: str = None,
+        workers: int = None,
+        retries: int = None,
+        backoff: float = None,
+        timeout: float = None,
+    ):
+        self.url = url or settings.OVERPASS_API
+        self.workers = workers or settings.OVERPASS_WORKERS
+        self.timeout = timeout or settings.OVERPASS_TIMEOUT
+        retries = settings.OVERPASS_RETRIES if retries is None else retries
+        backoff = settings.OVERPASS_BACKOFF if backoff is None else backoff
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            # Overpass answers with 429 and 504 if it is overloaded
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(["GET", "POST"]),
+            respect_retry_after_header=True,
+        )
+        adapter = HTTPAdapter(
+            max_retries=retry, pool_connections=1, pool_maxsize=self.workers
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.session.close()
+
+    def fetch_raw(self, query: str) -> bytes:
+        """
+        Send a single query to the overpass API and return the undecoded response.
+        """
+        response = self.session.post(self.url, data={"data": query}, timeout=self.timeout)
+        response.raise_for_status()
+        return response.content
+
+    def fetch(self, query: str) -> dict:
+        """
+        Send a single query to the overpass API and return the decoded response.
+        """
+        return decode_response(self.fetch_raw(query))
+
+    def fetch_tiles(self, build_query, bbox, tile_size: float) -> list:
+        """
+        Fetch the data of a bounding box (south, west, north, east) tile by tile, as the undecoded response of each tile.
+        build_query is called with the overpass bbox filter of each tile, e.g. "(50.9,13.5,51.0,13.6)".
+        """
+        tiles = split_bbox(bbox, tile_size)
+        print(f"Fetching {len(tiles)} tiles from {self.url} with {self.workers} workers")
+
+        queries = [build_query(format_bbox(tile)) for tile in tiles]
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return list(executor.map(self.fetch_raw, queries))
+
+    def fetch_tiled(self, build_query, bbox, tile_size: float) -> dict:
+        """
+        Fetch the data of a bounding box tile by tile, see fetch_tiles.
+        The elements of all tiles are merged and deduplicated by their type and id.
+        """
+        contents = self.fetch_tiles(build_query, bbox, tile_size)
+        return merge_elements([decode_response(content) for content in contents])
+
+
+def decode_response(content: bytes) -> dict:
+    """
+    Decode a response of the overpass API.
+    """
+    data = json.loads(content)
+    # Overpass reports timeouts and memory exhaustion as a remark in an otherwise successful response
+    remark = data.get("remark", "")
+    if "runtime error" in remark:
+        raise OverpassError(remark)
+    return data
+
+
+def merge_elements(results) -> dict:
+    """
+    Merge the elements of several overpass responses, deduplicated by their type and id.
+    """
+    elements = {}
+    for result in results:
+        for element in result["elements"]:
+            key = (element["type"], element["id"])
+            # Skeleton outputs of the same element carry less information, so keep the richer one
+            if key not in elements or len(element) > len(elements[key]):
+                elements[key] = element
+    return {"elements": list(elements.values())}
@@ -0,0 +1,51 @@
+import math
+
+# The WGS84 ellipsoid
+WGS84_RADIUS = 6378137.0
+WGS84_FLATTENING = 1 / 298.257223563
+WGS84_E2 = WGS84_FLATTENING * (2 - WGS84_FLATTENING)
+
+
+class LocalProjection:
+    """
+    A local equirectangular projection in meters around a reference coordinate.
+    The scale factors are those of the WGS84 ellipsoid at the reference latitude, so distances are true meters
+    only near it: east-west distances are off by about tan(latitude) times the north-south offset from the reference
+    in radians, which is about 0.2% at 10 km and 1% at 50 km from the reference around 53°N, and grows linearly beyond.
+    North-south distances stay within about 0.1% for a few hundred kilometers.
+    Unlike web mercator, this is plain arithmetic and does not need a PROJ call per geometry.
+    """
+
+    def __init__(self, lon: float, lat: float):
+        self.lon = lon
+        self.lat = lat
+        cos = math.cos(math.radians(lat))
+        w2 = 1 / (1 - WGS84_E2 * (1 - cos * cos))
+        w = math.sqrt(w2)
+        meters_per_degree = math.radians(WGS84_RADIUS)
+        # Meters per degree of longitude and latitude
+        self.kx = meters_per_degree * w * cos
+        self.ky = meters_per_degree * w * w2 * (1 - WGS84_E2)
+
+    @classmethod
+    def around(cls, coordinates) -> "LocalProjection":
+        """
+        Get the projection around the center of the bounding box of (lon, lat) coordinates.
+        """
+        lons = [coordinate[0] for coordinate in coordinates]
+        lats = [coordinate[1] for coordinate in coordinates]
+        return cls((min(lons) + max(lons)) / 2, (min(lats) + max(lats)) / 2)
+
+    def forward(self, coordinates) -> list:
+        """
+        Project (lon, lat) coordinates to (x, y) in meters.
+        """
+        lon0, lat0, kx, ky = self.lon, self.lat, self.kx, self.ky
+        return [((lon - lon0) * kx, (lat - lat0) * ky) for lon, lat, *_ in coordinates]
+
+    def inverse(self, coordinates) -> list:
+        """
+        Convert projected (x, y) coordinates in meters back to (lon, lat).
+        """
+        lon0, lat0, kx, ky = self.lon, self.lat, self.kx, self.ky
+        return [(lon0 + x / kx, lat0 + y / ky) for x, y in coordinates]
@@ -0,0 +1,120 @@
+import re
+import weakref
+
+from django.conf import settings
+from django.db import connection
+from pois.models import POI_CATEGORIES, Edge, Landmark, Poi, PoiEdge, PoiLine
+
+
+def build_statements() -> dict:
+    """
+    Build the hot spatial queries of the match endpoints, by name.
+    The categories are part of the statement, so that postgres can plan with the partial index of each category.
+    Geometries are passed as WKB in lon/lat, distances in meters.
+    The queries only return the columns that are needed for matching, in lon/lat.
+    They are projected to meters in python, around each route.
+    """
+    poi_table = connection.ops.quote_name(Poi._meta.db_table)
+    line_table = connection.ops.quote_name(PoiLine._meta.db_table)
+    landmark_table = connection.ops.quote_name(Landmark._meta.db_table)
+    edge_table = connection.ops.quote_name(Edge._meta.db_table)
+    poi_edge_table = connection.ops.quote_name(PoiEdge._meta.db_table)
+
+    statements = {}
+    # Candidates of the categories in $3 in one query, with one branch per category.
+    # The branches of the categories that are not asked for are skipped by their one-time filter.
+    # Rows of (category, lon, lat)
+    statements["match_points"] = (
+        ["bytea", "float8", "text[]"],
+        "\nUNION ALL\n".join(
+            f"""
+            SELECT category, ST_X(coordinate::geometry), ST_Y(coordinate::geometry) FROM {poi_table}
+            WHERE ST_DWithin(coordinate, ST_GeogFromWKB($1), $2)
+            AND category = '{category}' AND '{category}' = ANY($3)
+            """
+            for category in POI_CATEGORIES
+        ),
+    )
+    # Rows of (category, wkb)
+    statements["match_lines"] = (
+        ["bytea", "float8", "text[]"],
+        "\nUNION ALL\n".join(
+            f"""
+            SELECT category, ST_AsBinary(line::geometry) FROM {line_table}
+            WHERE ST_DWithin(line, ST_GeogFromWKB($1), $2)
+            AND category = '{category}' AND '{category}' = ANY($3)
+            """
+            for category in POI_CATEGORIES
+        ),
+    )
+    # Rows of (id, name, category, type, tags, lon, lat)
+    statements["match_landmarks"] = (
+        ["bytea", "float8"],
+        f"""
+        SELECT id, name, category, type, tags, ST_X(coordinate::geometry), ST_Y(coordinate::geometry)
+        FROM {landmark_table}
+        WHERE ST_DWithin(coordinate, ST_GeogFromWKB($1), $2)
+        """,
+    )
+    # The points of interest snapped onto edges of the routing graph, looked up by edge id, rows of
+    # (edge id, category, is line, start lon, start lat, end lon, end lat, distance).
+    # Known edges without points of interest have a row with nulls, unknown edges have no row.
+    statements["match_edges"] = (
+        ["int8[]", "text[]"],
+        f"""
+        WITH e AS (SELECT id FROM {edge_table} WHERE id = ANY($1))
+        SELECT e.id, p.category, p.is_line,
+            ST_X(p.start::geometry), ST_Y(p.start::geometry),
+            ST_X(p."end"::geometry), ST_Y(p."end"::geometry), p.distance
+        FROM e
+        LEFT JOIN {poi_edge_table} AS p ON p.edge_id = e.id AND p.category = ANY($2)
+        """,
+    )
+    return statements
+
+
+STATEMENTS = build_statements()
+
+# The names of the statements that are already prepared, by database connection.
+# Pooled connections keep their prepared statements when they are reused.
+prepared_statements = weakref.WeakKeyDictionary()
+
+
+def prepare(name: str):
+    """
+    Prepare a statement on the current database connection, if this did not happen yet.
+    """
+    connection.ensure_connection()
+    prepared = prepared_statements.setdefault(connection.connection, set())
+    if name in prepared:
+        return
+    types, sql = STATEMENTS[name]
+    with connection.cursor() as cursor:
+        cursor.execute(f"PREPARE {name} ({', '.join(types)}) AS {sql}")
+    prepared.add(name)
+
+
+def prepared_query(name: str, params: list):
+    """
+    Get the sql and parameters to run one of the hot spatial queries.
+    If prepared statements are enabled, the query executes the prepared statement.
+    Otherwise, the sql of the statement is returned to be planned as usual,
+    with the parameters in the order of its placeholders.
+    """
+    if settings.POSTGRES_PREPARED_STATEMENTS:
+        prepare(name)
+        return f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params
+    _, sql = STATEMENTS[name]
+    # $N is the N-th parameter, wherever it appears in the statement
+    positions = [int(number) for number in re.findall(r"\$(\d+)", sql)]
+    return re.sub(r"\$\d+", "%s", sql), [params[position - 1] for position in positions]
+
+
+def fetch(name: str, params: list) -> list:
+    """
+    Run one of the hot spatial queries and return its rows as plain tuples, without building model instances.
+    """
+    sql, params = prepared_query(name, params)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
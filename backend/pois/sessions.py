@@ -0,0 +1,89 @@
+import bisect
+import secrets
+
+from django.core.cache import caches
+from pois.matching import RouteContext
+
+
+class MatchSession:
+    """
+    The previous match of a client, to match a rerouted route incrementally.
+    Holds the vertices of the route in lon/lat, their distances along the route in the projection of the session,
+    and the merged segments of each category as distances along the route.
+    Sessions are stored in a cache that all worker processes share, so a reroute may reach any worker.
+    """
+
+    def __init__(self, context: RouteContext, config: dict, segments_by_category: dict, version: int):
+        self.coords = context.linestring.coords
+        self.projection = context.projection
+        self.cumulative = context.cumulative
+        self.length = context.length
+        self.config = config
+        self.segments_by_category = segments_by_category
+        self.version = version
+
+
+def load_session(token: str):
+    """
+    Get the match session of a token, or None if it is unknown or expired.
+    """
+    return caches["match-sessions"].get(token)
+
+
+def save_session(token: str, session: MatchSession) -> str:
+    """
+    Store a match session under a token, or under a new token if none is given.
+    Sessions expire after MATCH_SESSION_TTL seconds, and the cache drops old ones beyond MAX_MATCH_SESSIONS.
+    Returns the token.
+    """
+    token = token or secrets.token_urlsafe(16)
+    caches["match-sessions"].set(token, session)
+    return token
+
+
+def changed_window(session: MatchSession, context: RouteContext, margin: float):
+    """
+    Compare the vertices of the previous and the new route, to find the part of the new route that needs to be matched again.
+    The window around the changed vertices is extended by twice the margin on both sides,
+    so that both the previous segments and the new ones are kept at least a margin away from where their routes end.
+    Returns (first vertex, last vertex, prefix end, suffix start), with the distances along the new route
+    up to which and from which the previous segments are kept, or None if nothing can be kept.
+    The vertices are None if the route did not change.
+    """
+    previous, current = session.coords, context.linestring.coords
+    cumulative = context.cumulative
+    limit = min(len(previous), len(current))
+
+    prefix = 0
+    while prefix < limit and previous[prefix] == current[prefix]:
+        prefix += 1
+    if prefix == len(previous) == len(current):
+        return None, None, context.length, context.length
+    suffix = 0
+    while suffix < limit - prefix and previous[-1 - suffix] == current[-1 - suffix]:
+        suffix += 1
+
+    # Where the routes start and stop to share their vertices
+    prefix_end = cumulative[prefix - 1] - margin if prefix > 0 else 0
+    suffix_start = cumulative[len(current) - suffix] + margin if suffix > 0 else context.length
+    if prefix_end <= 0 and suffix_start >= context.length:
+        return None
+
+    first = max(bisect.bisect_right(cumulative, prefix_end - margin) - 1, 0)
+    last = min(bisect.bisect_left(cumulative, suffix_start + margin), len(current) - 1)
+    last = max(last, first + 1)
+    return first, last, max(prefix_end, 0), min(suffix_start, context.length)
+
+
+def clip_segments(segments: list, start: float, end: float, shift: float = 0) -> list:
+    """
+    Clip segments given as distances along a route to the range between start and end, after shifting them.
+    """
+    if start >= end:
+        return []
+    clipped = []
+    for dist_start, dist_end in segments:
+        dist_start, dist_end = dist_start + shift, dist_end + shift
+        if dist_start <= end and dist_end >= start:
+            clipped.append([max(dist_start, start), min(dist_end, end)])
+    return clipped
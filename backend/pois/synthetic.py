@@ -0,0 +1,295 @@
+import json
+import math
+import random
+
+from django.contrib.gis.geos import LineString, Point
+from pois.geometry import EARTH_RADIUS
+from pois.imports import build_poi_lines
+from pois.models import POI_CATEGORIES, Landmark, Poi, PoiLine
+
+# Landmark types with their OSM tags, a mix of common and low priority landmarks
+LANDMARK_TYPES = [
+    ("Kirche", "amenity", {"amenity": "place_of_worship", "religion": "christian"}),
+    ("Apotheke", "amenity", {"amenity": "pharmacy"}),
+    ("Supermarkt", "shop", {"shop": "supermarket"}),
+    ("Bäckerei", "shop", {"shop": "bakery"}),
+    ("Denkmal", "historic", {"historic": "memorial"}),
+    ("Haltestelle", "public_transport", {"public_transport": "platform", "bus": "yes"}),
+    ("Mülleimer", "amenity", {"amenity": "waste_basket"}),
+    ("Sitzbank", "amenity", {"amenity": "bench"}),
+    ("Fahrradständer", "amenity", {"amenity": "bicycle_parking"}),
+    ("Poller", "barrier", {"barrier": "bollard"}),
+]
+# How common the landmark types are in a city, roughly as in OSM
+LANDMARK_WEIGHTS = [2, 3, 4, 4, 1, 6, 20, 25, 15, 20]
+
+# Objects per square kilometer in a city-scale dataset, by poi category and for the landmarks
+CITY_DENSITIES = {
+    "construction": 20,
+    "accidenthotspot": 5,
+    "greenwave": 10,
+    "veloroute": 20,
+    "landmark": 400,
+}
+# The share of the objects of a poi category that are lines along roads, the others are points
+LINE_SHARES = {
+    "construction": 0.5,
+    "accidenthotspot": 0,
+    "greenwave": 0,
+    "veloroute": 1,
+}
+
+
+def offset(coordinate, east: float, north: float) -> tuple:
+    """
+    Move a (lon, lat) coordinate by the given meters to the east and north.
+    """
+    lon, lat = coordinate
+    return (
+        lon + math.degrees(east / (EARTH_RADIUS * math.cos(math.radians(lat)))),
+        lat + math.degrees(north / EARTH_RADIUS),
+    )
+
+
+def synthetic_route(vertices: int, start=(9.99, 53.55), step: float = 15, seed: int = 0) -> list:
+    """
+    Generate a route of (lon, lat) coordinates, as a random walk with the given distance between vertices in meters.
+    The heading changes slowly with occasional turns, like a route along streets.
+    """
+    rng = random.Random(seed)
+    heading = rng.uniform(0, 2 * math.pi)
+    route = [start]
+    for _ in range(vertices - 1):
+        if rng.random() < 0.05:
+            heading += rng.choice([-1, 1]) * math.pi / 2
+        heading += rng.gauss(0, 0.05)
+        route.append(offset(route[-1], step * math.cos(heading), step * math.sin(heading)))
+    return route
+
+
+def scatter_along(route: list, count: int, max_distance: float, rng: random.Random) -> list:
+    """
+    Scatter (lon, lat) coordinates near random vertices of a route, at most max_distance meters away from them.
+    """
+    coordinates = []
+    for _ in range(count):
+        vertex = route[rng.randrange(len(route))]
+        angle = rng.uniform(0, 2 * math.pi)
+        distance = rng.uniform(0, max_distance)
+        coordinates.append(offset(vertex, distance * math.cos(angle), distance * math.sin(angle)))
+    return coordinates
+
+
+def route_length(route: list) -> float:
+    """
+    Approximate the length of a route of (lon, lat) coordinates in meters.
+    """
+    length = 0
+    for a, b in zip(route, route[1:]):
+        scale = math.cos(math.radians(a[1]))
+        length += math.hypot((b[0] - a[0]) * scale, b[1] - a[1])
+    return math.radians(length) * EARTH_RADIUS
+
+
+def synthetic_pois_along(route: list, density: float, max_distance: float = 50, seed: int = 0) -> dict:
+    """
+    Generate (unsaved) points, lines and landmarks near a route.
+    The density is the number of objects per kilometer of route for each POI category and for the landmarks.
+    """
+    rng = random.Random(seed)
+    count = max(1, round(density * route_length(route) / 1000))
+
+    pois = []
+    lines = []
+    for category in POI_CATEGORIES:
+        for coordinate in scatter_along(route, count, max_distance, rng):
+            pois.append(Poi(category=category, coordinate=Point(coordinate, srid=4326)))
+        for coordinate in scatter_along(route, count, max_distance, rng):
+            angle = rng.uniform(0, 2 * math.pi)
+            length = rng.uniform(20, 200)
+            end = offset(coordinate, length * math.cos(angle), length * math.sin(angle))
+            lines.append(
+                PoiLine(
+                    category=category,
+                    line=LineString([coordinate, end], srid=4326),
+                    start=Point(coordinate, srid=4326),
+                    end=Point(end, srid=4326),
+                )
+            )
+
+    landmarks = []
+    for index, coordinate in enumerate(scatter_along(route, count, max_distance, rng)):
+        landmark_type, category, tags = rng.choice(LANDMARK_TYPES)
+        landmarks.append(
+            Landmark(
+                id=f"synthetic/{seed}/{index}",
+                name=f"{landmark_type} {index}",
+                category=category,
+                type=landmark_type,
+                tags=json.dumps(tags),
+                coordinate=Point(coordinate, srid=4326),
+            )
+        )
+
+    return {"pois": pois, "lines": lines, "landmarks": landmarks}
+
+
+class RoadGrid:
+    """
+    A synthetic street grid in a bounding box (south, west, north, east), with irregular block sizes.
+    Positions on the grid are given in meters east and north of the south west corner.
+    """
+
+    def __init__(self, bbox, spacing: float = 150, seed: int = 0):
+        rng = random.Random(f"{seed}/grid")
+        south, west, north, east = bbox
+        self.origin = (west, south)
+        self.width = math.radians(east - west) * EARTH_RADIUS * math.cos(math.radians((south + north) / 2))
+        self.height = math.radians(north - south) * EARTH_RADIUS
+        self.xs = self.road_positions(self.width, spacing, rng)
+        self.ys = self.road_positions(self.height, spacing, rng)
+
+    @staticmethod
+    def road_positions(extent: float, spacing: float, rng: random.Random) -> list:
+        positions = [rng.uniform(0, spacing)]
+        while positions[-1] + spacing * 0.7 < extent:
+            positions.append(positions[-1] + spacing * rng.uniform(0.7, 1.3))
+        return positions
+
+    def area(self) -> float:
+        """
+        The area of the grid in square kilometers.
+        """
+        return self.width * self.height / 1_000_000
+
+    def coordinate(self, x: float, y: float) -> tuple:
+        """
+        Get the (lon, lat) coordinate of a position on the grid.
+        """
+        return offset(self.origin, x, y)
+
+    def road_line(self, length: float, rng: random.Random, step: float = 25) -> list:
+        """
+        Get (lon, lat) coordinates along a random road, with a vertex every step meters and a little noise.
+        """
+        horizontal = rng.random() < 0.5
+        extent = self.width if horizontal else self.height
+        road = rng.choice(self.ys if horizontal else self.xs)
+        start = rng.uniform(0, max(0, extent - length))
+        vertices = max(2, math.ceil(min(length, extent) / step) + 1)
+        coordinates = []
+        for i in range(vertices):
+            along = start + min(length, extent) * i / (vertices - 1)
+            across = road + rng.gauss(0, 1)
+            coordinates.append(self.coordinate(along, across) if horizontal else self.coordinate(across, along))
+        return coordinates
+
+    def road_point(self, rng: random.Random, max_distance: float = 10) -> tuple:
+        """
+        Get a (lon, lat) coordinate next to a random road.
+        """
+        if rng.random() < 0.5:
+            coordinate = self.coordinate(rng.uniform(0, self.width), rng.choice(self.ys))
+        else:
+            coordinate = self.coordinate(rng.choice(self.xs), rng.uniform(0, self.height))
+        return scatter_along([coordinate], 1, max_distance, rng)[0]
+
+
+def city_pois(grid: RoadGrid, densities: dict, seed: int = 0):
+    """
+    Generate (unsaved) points and road-aligned lines for each poi category with a density, as objects per square kilometer.
+    The objects are yielded one by one, so that millions of them can be inserted in batches.
+    """
+    for category in POI_CATEGORIES:
+        rng = random.Random(f"{seed}/{category}")
+        count = round(densities.get(category, 0) * grid.area())
+        for index in range(count):
+            if rng.random() < LINE_SHARES[category]:
+                coordinates = grid.road_line(rng.uniform(30, 400), rng)
+                yield from build_poi_lines(coordinates, category, f"synthetic/{seed}/{category}/{index}")
+            else:
+                yield Poi(category=category, coordinate=Point(grid.road_point(rng), srid=4326))
+
+
+def city_landmarks(grid: RoadGrid, density: float, seed: int = 0, cluster_size: int = 40, spread: float = 60):
+    """
+    Generate (unsaved) landmarks with the given density, as objects per square kilometer.
+    Landmarks are clustered around points on roads, like in city centers, and have a realistic mix of types.
+    """
+    rng = random.Random(f"{seed}/landmark")
+    count = round(density * grid.area())
+    center = None
+    for index in range(count):
+        if index % cluster_size == 0:
+            center = grid.road_point(rng)
+        coordinate = offset(center, rng.gauss(0, spread), rng.gauss(0, spread))
+        landmark_type, category, tags = rng.choices(LANDMARK_TYPES, weights=LANDMARK_WEIGHTS)[0]
+        name = f"{landmark_type} {index}"
+        yield Landmark(
+            id=f"synthetic/{seed}/landmark/{index}",
+            name=name,
+            category=category,
+            type=landmark_type,
+            tags=json.dumps(dict(tags, name=name)),
+            coordinate=Point(coordinate, srid=4326),
+        )
+
+
+def grid_route(grid: RoadGrid, length: float, rng: random.Random, step: float = 15) -> tuple:
+    """
+    Generate a route along the roads of a grid, with a vertex every step meters.
+    Returns the (lon, lat) coordinates and the instructions of the route as (vertex index, graphhopper sign).
+    """
+    assert len(grid.xs) > 1 and len(grid.ys) > 1, "The grid needs at least two roads in each direction"
+
+    def has_road(i, j, direction):
+        return 0 <= i + direction[0] < len(grid.xs) and 0 <= j + direction[1] < len(grid.ys)
+
+    i, j = rng.randrange(len(grid.xs)), rng.randrange(len(grid.ys))
+    direction = rng.choice([d for d in [(1, 0), (0, 1), (-1, 0), (0, -1)] if has_road(i, j, d)])
+    positions = [(grid.xs[i], grid.ys[j])]
+    turns = [(0, 0)]
+    travelled = 0
+    while True:
+        blocks = rng.randint(1, 6)
+        next_i = min(max(i + direction[0] * blocks, 0), len(grid.xs) - 1)
+        next_j = min(max(j + direction[1] * blocks, 0), len(grid.ys) - 1)
+        start, end = (grid.xs[i], grid.ys[j]), (grid.xs[next_i], grid.ys[next_j])
+        distance = math.dist(start, end)
+        for k in range(1, math.ceil(distance / step) + 1):
+            fraction = min(1, k * step / distance)
+            positions.append((start[0] + (end[0] - start[0]) * fraction, start[1] + (end[1] - start[1]) * fraction))
+        travelled += distance
+        i, j = next_i, next_j
+        if travelled >= length:
+            break
+        # Turn left (1) or right (-1) at the crossing, into a road that continues
+        turn = rng.choice([t for t in [1, -1] if has_road(i, j, (-direction[1] * t, direction[0] * t))])
+        direction = (-direction[1] * turn, direction[0] * turn)
+        turns.append((len(positions) - 1, -2 if turn == 1 else 2))
+    # The last instruction is the arrival
+    turns.append((len(positions) - 1, 4))
+    return [grid.coordinate(x, y) for x, y in positions], turns
+
+
+def route_requests(
+    grid: RoadGrid, length: float, seed: int = 0, index: int = 0, threshold: int = 10, elongation: int = 20
+) -> tuple:
+    """
+    Generate a match request and a landmark request for the same synthetic route along the roads of a grid.
+    """
+    coordinates, turns = grid_route(grid, length, random.Random(f"{seed}/route/{index}"))
+    match_request = {
+        "threshold": threshold,
+        "elongation": elongation,
+        "route": [{"lon": lon, "lat": lat} for lon, lat in coordinates],
+    }
+    texts = {0: "Geradeaus weiterfahren", -2: "Links abbiegen", 2: "Rechts abbiegen", 4: "Ziel erreicht!"}
+    instructions = []
+    for (start, sign), (end, _) in zip(turns, turns[1:] + [turns[-1]]):
+        instructions.append({"interval": [start, end], "sign": sign, "text": texts[sign]})
+    landmark_request = {
+        "points": {"type": "LineString", "coordinates": [list(coordinate) for coordinate in coordinates]},
+        "instructions": instructions,
+    }
+    return match_request, landmark_request
@@ -0,0 +1,237 @@
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+
+# Upper bounds of the histogram buckets in seconds
+BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+
+# The spans of the request that the current thread serves
+current = threading.local()
+
+
+class Histogram:
+    """
+    A cumulative histogram of durations, in the Prometheus format.
+    """
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float):
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+        self.count += 1
+        self.sum += seconds
+
+
+# Histograms and counters of this worker process, by metric name and labels
+histograms = {}
+counters = {}
+histograms_lock = threading.Lock()
+
+# When this process last wrote its histograms and counters into the metrics directory
+last_flush = {"time": 0.0}
+# The pid of this process and the name of its metrics file
+process_file = {"pid": None, "name": None}
+
+
+def observe(metric: str, labels: tuple, seconds: float):
+    """
+    Add a duration to the histogram of a metric with the given (name, value) labels.
+    """
+    with histograms_lock:
+        histogram = histograms.get((metric, labels))
+        if histogram is None:
+            histogram = histograms[(metric, labels)] = Histogram()
+        histogram.observe(seconds)
+
+
+def increment(metric: str, labels: tuple, value: int = 1):
+    """
+    Add to the counter of a metric with the given (name, value) labels.
+    """
+    with histograms_lock:
+        counters[(metric, labels)] = counters.get((metric, labels), 0) + value
+
+
+def start_request():
+    """
+    Start collecting the spans of a request in the current thread.
+    """
+    current.spans = []
+
+
+def finish_request(endpoint: str, seconds: float) -> list:
+    """
+    Stop collecting spans, add them to the histograms and return them as (stage, category, seconds).
+    """
+    spans = getattr(current, "spans", None) or []
+    current.spans = None
+    observe("pois_request_duration_seconds", (("endpoint", endpoint),), seconds)
+    for stage, category, duration in spans:
+        labels = (("endpoint", endpoint), ("stage", stage), ("category", category))
+        observe("pois_stage_duration_seconds", labels, duration)
+    flush()
+    return spans
+
+
+def record(stage: str, seconds: float, category: str = ""):
+    """
+    Add a stage that was timed elsewhere to the spans of the current request.
+    """
+    spans = getattr(current, "spans", None)
+    if spans is not None:
+        spans.append((stage, category, seconds))
+
+
+@contextmanager
+def span(stage: str, category: str = ""):
+    """
+    Time a stage of the current request, optionally for a poi category.
+    Outside of a request, e.g. in benchmarks, nothing is recorded.
+    """
+    spans = getattr(current, "spans", None)
+    if spans is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans.append((stage, category, time.perf_counter() - start))
+
+
+def server_timing(spans: list, seconds: float) -> str:
+    """
+    Format spans as a Server-Timing header, with the summed duration of each stage in milliseconds.
+    """
+    stages = {}
+    for stage, _, duration in spans:
+        stages[stage] = stages.get(stage, 0) + duration
+    stages["total"] = seconds
+    return ", ".join(f"{stage};dur={duration * 1000:.2f}" for stage, duration in stages.items())
+
+
+def snapshot() -> tuple:
+    """
+    Copy the histograms of this process as (counts, count, sum) and its counters, by metric name and labels.
+    """
+    with histograms_lock:
+        histogram_snapshot = {
+            key: (list(histogram.counts), histogram.count, histogram.sum)
+            for key, histogram in histograms.items()
+        }
+        counter_snapshot = dict(counters)
+    return histogram_snapshot, counter_snapshot
+
+
+def flush(force: bool = False):
+    """
+    Write the histograms and counters of this process into its file in the METRICS_DIR,
+    at most every METRICS_FLUSH_INTERVAL seconds unless forced.
+    The files of exited processes are kept, so that the sums of all files never decrease.
+    """
+    directory = settings.METRICS_DIR
+    now = time.monotonic()
+    if not directory or (not force and now - last_flush["time"] < settings.METRICS_FLUSH_INTERVAL):
+        return
+    last_flush["time"] = now
+    histogram_snapshot, counter_snapshot = snapshot()
+    data = {
+        "histograms": [
+            [metric, labels, counts, count, total]
+            for (metric, labels), (counts, count, total) in histogram_snapshot.items()
+        ],
+        "counters": [[metric, labels, value] for (metric, labels), value in counter_snapshot.items()],
+    }
+    os.makedirs(directory, exist_ok=True)
+    # A reused pid must not overwrite the file of an exited process, so every process adds a unique suffix
+    # (looked up by pid, because workers forked from a preloading master inherit its module state)
+    if process_file["pid"] != os.getpid():
+        process_file["pid"] = os.getpid()
+        process_file["name"] = f"{os.getpid()}-{uuid.uuid4().hex}.json"
+    path = os.path.join(directory, process_file["name"])
+    # Write a temporary file first, so that readers never see a partial file
+    temporary = f"{path}.{threading.get_ident()}.tmp"
+    with open(temporary, "w") as file:
+        json.dump(data, file)
+    os.replace(temporary, path)
+
+
+def collect() -> tuple:
+    """
+    Sum up the histograms and counters of all worker processes from the METRICS_DIR,
+    or get those of this process if there is no metrics directory.
+    """
+    if not settings.METRICS_DIR:
+        return snapshot()
+    flush(force=True)
+    histogram_sums = {}
+    counter_sums = {}
+    for path in glob.glob(os.path.join(settings.METRICS_DIR, "*.json")):
+        try:
+            with open(path, "r") as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            continue
+        for metric, labels, counts, count, total in data["histograms"]:
+            key = (metric, tuple(tuple(label) for label in labels))
+            previous_counts, previous_count, previous_total = histogram_sums.get(
+                key, ([0] * len(BUCKETS), 0, 0.0)
+            )
+            histogram_sums[key] = (
+                [a + b for a, b in zip(previous_counts, counts)],
+                previous_count + count,
+                previous_total + total,
+            )
+        for metric, labels, value in data["counters"]:
+            key = (metric, tuple(tuple(label) for label in labels))
+            counter_sums[key] = counter_sums.get(key, 0) + value
+    return histogram_sums, counter_sums
+
+
+def render_metrics() -> str:
+    """
+    Render the histograms and counters of all worker processes in the Prometheus text format.
+    """
+    descriptions = {
+        "pois_request_duration_seconds": "Duration of requests to the pois endpoints.",
+        "pois_stage_duration_seconds": "Duration of the stages of requests to the pois endpoints.",
+    }
+    counter_descriptions = {
+        "pois_db_queries_total": "Database queries of requests to the pois endpoints.",
+        "pois_query_budget_exceeded_total": "Requests to the pois endpoints that exceeded the query budget.",
+        "pois_requests_shed_total": "Requests to the pois endpoints that were shed with 503.",
+    }
+    histogram_snapshot, counter_snapshot = collect()
+
+    lines = []
+    for metric, description in descriptions.items():
+        lines.append(f"# HELP {metric} {description}")
+        lines.append(f"# TYPE {metric} histogram")
+        for (name, labels), (counts, count, total) in sorted(histogram_snapshot.items()):
+            if name != metric:
+                continue
+            label_text = ",".join(f'{key}="{value}"' for key, value in labels)
+            for bound, bucket_count in zip(BUCKETS, counts):
+                lines.append(f'{metric}_bucket{{{label_text},le="{bound}"}} {bucket_count}')
+            lines.append(f'{metric}_bucket{{{label_text},le="+Inf"}} {count}')
+            lines.append(f"{metric}_sum{{{label_text}}} {total}")
+            lines.append(f"{metric}_count{{{label_text}}} {count}")
+    for metric, description in counter_descriptions.items():
+        lines.append(f"# HELP {metric} {description}")
+        lines.append(f"# TYPE {metric} counter")
+        for (name, labels), count in sorted(counter_snapshot.items()):
+            if name == metric:
+                label_text = ",".join(f'{key}="{value}"' for key, value in labels)
+                lines.append(f"{metric}{{{label_text}}} {count}")
+    return "\n".join(lines) + "\n"
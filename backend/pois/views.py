@@ -1,14 +1,24 @@
+import bisect
 import json
+import math
 import time
 
 from django.conf import settings
 from django.contrib.gis.geos import LineString, Point
-from django.contrib.gis.measure import D
 from django.http import HttpResponseBadRequest, JsonResponse
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import View
-from pois.models import Landmark, Poi, PoiLine
+from pois.encoding import OUTPUT_FORMATS, format_segments
+from pois.etags import conditional_match, get_dataset_version, get_edge_snap_threshold, parse_json
+from pois.geometry import linestring_from_wkb
+from pois.limits import Deadline, service_unavailable
+from pois.matching import MAX_UNKNOWN_PARTS, RouteContext, match_edges, sweep_segments
+from pois.models import POI_CATEGORIES
+from pois.projection import LocalProjection
+from pois.queries import fetch
+from pois.sessions import MatchSession, changed_window, clip_segments, load_session, save_session
+from pois.timing import span
 
 # A list of OSM Tags that are only used for matching of landmarks, if no others is found and if they are really close
 LOW_PRIORITY_TAGS = [
@@ -58,169 +68,380 @@ def merge_segments(segments):
     return segments[: index + 1]
 
 
-def get_segments(type_of_poi, route_linestring, elongation, threshold):
+def fetch_candidates(context, categories, threshold):
     """
-    Make segments around found pois on the route.
-    Overlaps between segments are merged into one segment.
-    Elongation defines how much points are elongated to a line along the route.
+    Fetch the candidates of several categories in one query for each geometry type, within the given threshold.
+    Returns the point rows and line rows of each category.
     """
+    candidates = {category: ([], []) for category in categories}
+    for category, lon, lat in fetch("match_points", [context.wkb, threshold, list(categories)]):
+        candidates[category][0].append((lon, lat))
+    for category, line_wkb in fetch("match_lines", [context.wkb, threshold, list(categories)]):
+        candidates[category][1].append((line_wkb,))
+    return candidates
 
-    route_lstr_mercator = route_linestring.transform(settings.METRICAL, clone=True)
-    route_length_mercator = route_lstr_mercator.length
 
-    nearby_point_pois = Poi.objects.filter(category=type_of_poi).filter(
-        coordinate__distance_lt=(route_linestring, D(m=threshold))
-    )
-    nearby_line_pois_intersecting = PoiLine.objects.filter(category=type_of_poi).filter(
-        line__distance_lt=(route_linestring, D(m=threshold))
-    )
+def match_candidates(
+    type_of_poi, context, nearby_point_pois, nearby_line_pois_intersecting, elongation, threshold, filter_points=False
+):
+    """
+    Make segments around the candidates of a category, as [start, end] distances along the route in meters.
+    If the candidates were fetched with a larger threshold, filter_points drops the points outside the threshold.
+    Lines are always clipped to the threshold.
+    """
+
+    projection = context.projection
+    route_projected = context.projected
+    route_length = context.length
 
     # Only use the line segments inside the buffered region
-    route_lstr_buffered = route_lstr_mercator.buffer(threshold)
-    nearby_line_pois_on_route = []
-    for poi in nearby_line_pois_intersecting:
-        line_on_route = poi.line.transform(settings.METRICAL, clone=True).intersection(
-            route_lstr_buffered
-        )
-        if len(line_on_route.coords) == 0:
-            continue
-        # Check if line is multiline
-        if line_on_route.geom_type == "MultiLineString":
-            for partial_line in line_on_route:
-                nearby_line_pois_on_route.append(partial_line)
-        else:
-            nearby_line_pois_on_route.append(line_on_route)
+    with span("clip", type_of_poi):
+        route_buffered, corridor = context.corridor(threshold)
+        nearby_point_pois = projection.forward(nearby_point_pois)
+        if filter_points:
+            nearby_point_pois = [
+                (x, y) for x, y in nearby_point_pois if corridor.intersects(Point(x, y))
+            ]
+        nearby_line_pois_on_route = []
+        for (line_wkb,) in nearby_line_pois_intersecting:
+            line_projected = LineString(projection.forward(linestring_from_wkb(line_wkb)))
+            # Cheap tests against the prepared corridor first,
+            # only lines that cross its boundary need the full intersection
+            if corridor.covers(line_projected):
+                line_on_route = line_projected
+            elif not corridor.intersects(line_projected):
+                continue
+            else:
+                line_on_route = line_projected.intersection(route_buffered)
+            if len(line_on_route.coords) == 0:
+                continue
+            # Check if line is multiline
+            if line_on_route.geom_type == "MultiLineString":
+                for partial_line in line_on_route:
+                    nearby_line_pois_on_route.append(partial_line)
+            else:
+                nearby_line_pois_on_route.append(line_on_route)
 
     if not nearby_point_pois and not nearby_line_pois_on_route:
         return []
 
-    # Match each coordinate onto the route in the mercator projection
+    # Match each coordinate onto the projected route
     segments = []
-    for poi in nearby_point_pois:
-        poi_coordinate_mercator = poi.coordinate.transform(
-            settings.METRICAL, clone=True
-        )
-        dist_on_route = route_lstr_mercator.project(poi_coordinate_mercator)
-        dist_start = max(0, dist_on_route - elongation)
-        dist_end = min(route_length_mercator, dist_on_route + elongation)
-        segments.append([dist_start, dist_end])
-    for line in nearby_line_pois_on_route:
-        dist_start = route_lstr_mercator.project(
-            Point(line.coords[0], srid=settings.METRICAL)
+    with span("project", type_of_poi):
+        for x, y in nearby_point_pois:
+            dist_on_route = route_projected.project(Point(x, y))
+            dist_start = max(0, dist_on_route - elongation)
+            dist_end = min(route_length, dist_on_route + elongation)
+            segments.append([dist_start, dist_end])
+        for line in nearby_line_pois_on_route:
+            dist_start = route_projected.project(Point(line.coords[0]))
+            dist_end = route_projected.project(Point(line.coords[-1]))
+            if dist_start > dist_end:
+                dist_start, dist_end = dist_end, dist_start
+            segments.append([dist_start, dist_end])
+
+    with span("merge", type_of_poi):
+        return merge_segments(segments)
+
+
+def locate_segments(context, segments):
+    """
+    Convert segments given as distances along the route in meters to linear references:
+    The start and end distance along the route, and the indices of the route vertices around the segment.
+    """
+    cumulative = context.cumulative
+
+    def locate(distance):
+        # Find the route edge that contains the distance
+        index = bisect.bisect_right(cumulative, distance) - 1
+        index = min(max(index, 0), len(cumulative) - 2)
+        edge_length = cumulative[index + 1] - cumulative[index]
+        fraction = (distance - cumulative[index]) / edge_length if edge_length > 0 else 0
+        fraction = min(max(fraction, 0), 1)
+        meters = cumulative[index] + fraction * edge_length
+        return index, fraction, meters
+
+    located_segments = []
+    for dist_start, dist_end in segments:
+        start_index, _, start_meters = locate(dist_start)
+        end_index, end_fraction, end_meters = locate(dist_end)
+        located_segments.append(
+            {
+                "start": round(start_meters, 2),
+                "end": round(end_meters, 2),
+                "startIndex": start_index,
+                "endIndex": end_index + 1 if end_fraction > 0 else end_index,
+            }
         )
-        dist_end = route_lstr_mercator.project(
-            Point(line.coords[-1], srid=settings.METRICAL)
+    return located_segments
+
+
+def validate_distance(value, name: str, maximum: int):
+    """
+    Check that a threshold or elongation is a positive integer up to the maximum.
+    Returns the error message, or None if the distance is valid.
+    """
+    if not isinstance(value, int) or value < 0:
+        return f"Invalid {name}."
+    if value > maximum:
+        return f"{name.capitalize()} must be at most {maximum}."
+    return None
+
+
+def parse_category_config(categories, threshold: int, elongation: int):
+    """
+    Parse the optional categories of a match request, as a list of {"category", "threshold", "elongation"}.
+    A category without threshold or elongation uses the ones of the request.
+    Returns the (threshold, elongation) by category in the requested order and an error message, if any.
+    """
+    if categories is None:
+        return {category: (threshold, elongation) for category in POI_CATEGORIES}, None
+    if not isinstance(categories, list) or not categories:
+        return None, "Invalid categories."
+
+    config = {}
+    for entry in categories:
+        if not isinstance(entry, dict):
+            return None, "Invalid categories."
+        category = entry.get("category")
+        if category not in POI_CATEGORIES:
+            return None, f"Unknown category: {category}"
+        if category in config:
+            return None, f"Duplicate category: {category}"
+        category_threshold = entry.get("threshold", threshold)
+        error = validate_distance(category_threshold, "threshold", settings.MAX_THRESHOLD)
+        if error:
+            return None, error
+        category_elongation = entry.get("elongation", elongation)
+        error = validate_distance(category_elongation, "elongation", settings.MAX_ELONGATION)
+        if error:
+            return None, error
+        config[category] = (category_threshold, category_elongation)
+    return config, None
+
+
+def validate_edge_ids(edge_ids, route_points: int):
+    """
+    Check that edge ids are [first vertex, last vertex, edge id] intervals of the route,
+    like the edge_id path details of GraphHopper.
+    Returns the error message, or None if the edge ids are valid.
+    """
+    if not isinstance(edge_ids, list):
+        return "Invalid edge_ids."
+    for detail in edge_ids:
+        if (
+            not isinstance(detail, list)
+            or len(detail) != 3
+            or not all(isinstance(value, int) for value in detail)
+            or not 0 <= detail[0] <= detail[1] < route_points
+        ):
+            return "Invalid edge_ids."
+    return None
+
+
+def match_part(context, first, last, config, deadline):
+    """
+    Match the categories of the config geometrically on the part of the route between two vertices.
+    Returns the segments by category as distances along the whole route, or None if the deadline expired.
+    """
+    if first == 0 and last == len(context.coords) - 1:
+        part_context, offset = context, 0
+    else:
+        part = LineString(context.linestring.coords[first : last + 1], srid=settings.LONLAT)
+        part_context, offset = RouteContext(part, context.projection), context.cumulative[first]
+
+    # Fetch the candidates of all categories at once, within the largest threshold
+    max_threshold = max(category_threshold for category_threshold, _ in config.values())
+    if deadline.expired():
+        return None
+    with span("query"):
+        candidates = fetch_candidates(part_context, config, max_threshold)
+
+    segments_by_category = {}
+    for type_of_poi, (category_threshold, category_elongation) in config.items():
+        if deadline.expired():
+            return None
+        point_rows, line_rows = candidates[type_of_poi]
+        segments = match_candidates(
+            type_of_poi,
+            part_context,
+            point_rows,
+            line_rows,
+            category_elongation,
+            category_threshold,
+            filter_points=category_threshold < max_threshold,
         )
-        if dist_start > dist_end:
-            dist_start, dist_end = dist_end, dist_start
-        segments.append([dist_start, dist_end])
-
-    segments = merge_segments(segments)
-
-    # Convert the segments to actual coordinates on the route, by traversing the route
-    # and finding the corresponding points for each segment
-    projected_segments = []
-    from_dist = 0
-    running_segment = None
-    # Iterate through all coordinates of the route
-    for i in range(len(route_lstr_mercator.coords) - 1):
-        if len(segments) == 0:
-            break  # Projected all segments
-
-        from_coord = Point(route_lstr_mercator.coords[i], srid=settings.METRICAL)
-        to_coord = Point(route_lstr_mercator.coords[i + 1], srid=settings.METRICAL)
-        to_dist = from_dist + from_coord.distance(to_coord)
-
-        x = segments[0][0]
-        y = segments[0][1]
-        a = from_dist
-        b = to_dist
-
-        from_dist = to_dist  # Update from_dist for next iteration
-
-        # Skipped a segment
-        # Segment:   x--y
-        # Route:    a----b
-        if x >= a and y <= b:
-            # Add the projected segment directly
-            projected_segments.append(
-                [
-                    route_lstr_mercator.interpolate(segments[0][0]),
-                    route_lstr_mercator.interpolate(segments[0][1]),
-                ]
+        segments_by_category[type_of_poi] = [
+            [min(start + offset, context.length), min(end + offset, context.length)]
+            for start, end in segments
+        ]
+    return segments_by_category
+
+
+def match_route(context, config, edge_ids, deadline):
+    """
+    Match the categories of the config on the route, as merged segments by category.
+    Categories within the snapping threshold are looked up by the edge ids of the route, if given,
+    the others and the parts of the route with unknown edges are matched geometrically.
+    Returns None if the deadline expired.
+    """
+    last_vertex = len(context.coords) - 1
+
+    # Categories within the threshold the edges were snapped with are looked up by the edge ids of the route
+    edge_config = {}
+    snap_threshold = get_edge_snap_threshold() if edge_ids else None
+    if snap_threshold is not None:
+        edge_config = {
+            category: values
+            for category, values in config.items()
+            if values[0] <= snap_threshold
+        }
+    # The parts of the route that are matched geometrically, as (first vertex, last vertex, config)
+    parts = [
+        (
+            0,
+            last_vertex,
+            {category: values for category, values in config.items() if category not in edge_config},
+        ),
+    ]
+    segments_by_category = {category: [] for category in config}
+    if edge_config:
+        if deadline.expired():
+            return None
+        with span("query", "edges"):
+            rows = fetch(
+                "match_edges", [[edge_id for _, _, edge_id in edge_ids], list(edge_config)]
             )
-            segments.pop(0)
+        with span("lookup"):
+            edge_segments, unknown = match_edges(context, edge_ids, rows, edge_config)
+        if len(unknown) > MAX_UNKNOWN_PARTS:
+            # Too fragmented, match the whole route geometrically
+            parts = [(0, last_vertex, config)]
+        else:
+            for type_of_poi, segments in edge_segments.items():
+                segments_by_category[type_of_poi].extend(segments)
+            # Unknown edges fall back to geometric matching
+            parts.extend((first, last, edge_config) for first, last in unknown)
+
+    for first, last, part_config in parts:
+        if not part_config:
             continue
+        part_segments = match_part(context, first, last, part_config, deadline)
+        if part_segments is None:
+            return None
+        for type_of_poi, segments in part_segments.items():
+            segments_by_category[type_of_poi].extend(segments)
+
+    with span("merge"):
+        return {
+            type_of_poi: merge_segments(segments)
+            for type_of_poi, segments in segments_by_category.items()
+        }
+
+
+def rematch_route(session, context, config, deadline):
+    """
+    Match a changed route incrementally, after the route of the session was matched with the same config.
+    Only the window around the vertices that changed is matched again, the previous segments are kept
+    along the shared prefix and the shared suffix of both routes.
+    Returns the merged segments by category, or None if the route has to be matched as a whole or the deadline expired.
+    """
+    # How far the segments of a poi can reach from where it lies
+    margin = max(threshold + elongation for threshold, elongation in config.values())
+    with span("diff"):
+        window = changed_window(session, context, margin)
+    if window is None:
+        return None
+    first, last, prefix_end, suffix_start = window
+
+    window_segments = {}
+    if first is not None:
+        window_segments = match_part(context, first, last, config, deadline)
+        if window_segments is None:
+            return None
+
+    # Distances along the shared suffix moved by the change in length
+    shift = context.length - session.length
+    with span("merge"):
+        return {
+            type_of_poi: merge_segments(
+                clip_segments(session.segments_by_category[type_of_poi], 0, prefix_end)
+                + clip_segments(window_segments.get(type_of_poi, []), prefix_end, suffix_start)
+                + clip_segments(
+                    session.segments_by_category[type_of_poi], suffix_start, context.length, shift
+                )
+            )
+            for type_of_poi in config
+        }
 
-        # Entered a new segment
-        # Segment:   x--
-        # Route:   a---b
-        if x >= a and x <= b:
-            # Start a new segment
-            running_segment = []
-            running_segment.append(route_lstr_mercator.interpolate(segments[0][0]))
-            running_segment.append(to_coord)
-
-        # Inside a segment
-        # Segment: x-------y
-        # Route:     a---b
-        if x <= a and y >= b:
-            if running_segment is None:  # May happen when there is an exact overlap
-                running_segment = []
-            running_segment.append(from_coord)
-            running_segment.append(to_coord)
-
-        # Exited a segment
-        # Segment:   --y
-        # Route:     a---b
-        if y >= a and y <= b:
-            if running_segment is None:
-                running_segment = []
-            running_segment.append(from_coord)
-            running_segment.append(route_lstr_mercator.interpolate(segments[0][1]))
-
-            # Reset running segment
-            projected_segments.append(running_segment)
-            running_segment = None
-            segments.pop(0)
-
-    # Transform all segments back to lonlat
-    projected_segments = [
-        [point.transform(settings.LONLAT, clone=True) for point in segment]
-        for segment in projected_segments
-    ]
-    # Point object is not serializable, so we convert it to a list of coordinates
-    projected_segments_json = [
-        [[point.x, point.y] for point in segment] for segment in projected_segments
-    ]
-    return projected_segments_json
+
+def get_all_segments(route_linestring, elongation, threshold):
+    """
+    Make segments around found pois of all categories on the route, as lists of [lon, lat] coordinates by category.
+    This is the path of a match request without options, for the warm-up and the benchmarks.
+    """
+    context = RouteContext(route_linestring)
+    config = {category: (threshold, elongation) for category in POI_CATEGORIES}
+    segments_by_category = match_route(context, config, None, Deadline(0))
+    with span("backproject"):
+        return sweep_segments(context, segments_by_category)
 
 
 @method_decorator(csrf_exempt, name="dispatch")
+@method_decorator(conditional_match, name="post")
 class MatchPoisResource(View):
     def post(self, request):
         """
         Determine which pois are on a given route.
         """
+        deadline = Deadline()
 
         try:
-            json_data = json.loads(request.body)
+            with span("parse"):
+                json_data = parse_json(request)
         except json.JSONDecodeError:
             return HttpResponseBadRequest(json.dumps({"error": "Invalid request."}))
 
         threshold = json_data.get("threshold", 5)
         # Make sure threshold is a positive integer
-        if not isinstance(threshold, int) or threshold < 0:
-            return HttpResponseBadRequest(json.dumps({"error": "Invalid threshold."}))
+        error = validate_distance(threshold, "threshold", settings.MAX_THRESHOLD)
+        if error:
+            return HttpResponseBadRequest(json.dumps({"error": error}))
 
         elongation = json_data.get("elongation", 20)
-        # Make sure elongation is a positive float
-        if not isinstance(elongation, int) or elongation < 0:
-            return HttpResponseBadRequest(json.dumps({"error": "Invalid elongation."}))
+        # Make sure elongation is a positive integer
+        error = validate_distance(elongation, "elongation", settings.MAX_ELONGATION)
+        if error:
+            return HttpResponseBadRequest(json.dumps({"error": error}))
+
+        # Optional selection of categories, with their own threshold and elongation
+        config, error = parse_category_config(json_data.get("categories"), threshold, elongation)
+        if error:
+            return HttpResponseBadRequest(json.dumps({"error": error}))
+
+        # Optional output options to make the response more compact
+        output_format = json_data.get("format", "coordinates")
+        if output_format not in OUTPUT_FORMATS:
+            return HttpResponseBadRequest(json.dumps({"error": "Invalid format."}))
+
+        precision = json_data.get("precision")
+        # Make sure precision is a number of decimal places
+        if precision is not None and (
+            not isinstance(precision, int) or not 0 <= precision <= 10
+        ):
+            return HttpResponseBadRequest(json.dumps({"error": "Invalid precision."}))
+
+        dedupe = json_data.get("dedupe", False)
+        if not isinstance(dedupe, bool):
+            return HttpResponseBadRequest(json.dumps({"error": "Invalid dedupe."}))
 
         route = json_data.get("route")
         if not route:
             return HttpResponseBadRequest(json.dumps({"error": "No route data"}))
+        if len(route) > settings.MAX_ROUTE_POINTS:
+            return HttpResponseBadRequest(
+                json.dumps({"error": f"Route must have at most {settings.MAX_ROUTE_POINTS} points"})
+            )
 
         try:
             route_points = [(point["lon"], point["lat"]) for point in route]
@@ -228,38 +449,85 @@ class MatchPoisResource(View):
             return HttpResponseBadRequest(json.dumps({"error": "Invalid route data"}))
 
         try:
-            route_linestring: LineString = LineString(
-                route_points, srid=settings.LONLAT
-            )
+            with span("parse"):
+                route_linestring: LineString = LineString(
+                    route_points, srid=settings.LONLAT
+                )
         except ValueError:
             return HttpResponseBadRequest(json.dumps({"error": "Invalid route points"}))
 
+        # Optional edge ids of the route in the routing graph, to look up the snapped pois
+        edge_ids = json_data.get("edge_ids")
+        if edge_ids is not None:
+            error = validate_edge_ids(edge_ids, len(route_points))
+            if error:
+                return HttpResponseBadRequest(json.dumps({"error": error}))
+
         response_json = {"success": True}
 
-        for type_of_poi in [
-            "construction",
-            "accidenthotspot",
-            "greenwave",
-            "veloroute",
-        ]:
-            response_json[f"{type_of_poi}s"] = get_segments(
-                type_of_poi,
-                route_linestring,
-                elongation,
-                threshold,
+        # Optional session of a client that reroutes, to only match the changed part of the route again
+        session_token = json_data.get("session")
+        if session_token is not None and session_token is not True and not isinstance(session_token, str):
+            return HttpResponseBadRequest(json.dumps({"error": "Invalid session."}))
+        session = None
+        if isinstance(session_token, str):
+            session = load_session(session_token)
+            if session is None:
+                # Unknown or expired, start a new session
+                session_token = True
+            elif (
+                edge_ids or session.config != config or session.version != get_dataset_version()
+            ):
+                session = None
+
+        # Prepare the route once for all categories, in the projection of the session
+        context = RouteContext(route_linestring, session.projection if session else None)
+
+        segments_by_category = None
+        if session is not None:
+            segments_by_category = rematch_route(session, context, config, deadline)
+        # Only match the whole route if the rematch was not cut off by the deadline
+        if segments_by_category is None and not deadline.expired():
+            segments_by_category = match_route(context, config, edge_ids, deadline)
+        if segments_by_category is None:
+            return service_unavailable("Request took too long.")
+
+        if session_token is not None:
+            response_json["session"] = save_session(
+                session_token if isinstance(session_token, str) else None,
+                MatchSession(context, config, segments_by_category, get_dataset_version()),
             )
 
-        return JsonResponse(response_json)
+        if output_format == "linear":
+            with span("backproject"):
+                for type_of_poi, segments in segments_by_category.items():
+                    response_json[f"{type_of_poi}s"] = locate_segments(context, segments)
+        else:
+            # Convert the segments of all categories in one traversal of the route
+            with span("backproject"):
+                projected = sweep_segments(context, segments_by_category)
+            for type_of_poi, segments in projected.items():
+                with span("serialize", type_of_poi):
+                    response_json[f"{type_of_poi}s"] = format_segments(
+                        segments, output_format, precision, dedupe
+                    )
+
+        with span("serialize"):
+            return JsonResponse(response_json)
 
 
 @method_decorator(csrf_exempt, name="dispatch")
+@method_decorator(conditional_match, name="post")
 class MatchLandmarksResource(View):
     def post(self, request):
         """
         Determine which landmarks are on a given route.
         """
+        deadline = Deadline()
+
         try:
-            json_data: dict = json.loads(request.body)
+            with span("parse"):
+                json_data: dict = parse_json(request)
         except json.JSONDecodeError:
             return HttpResponseBadRequest(json.dumps({"error": "Invalid request."}))
 
@@ -304,6 +572,10 @@ class MatchLandmarksResource(View):
             return HttpResponseBadRequest(
                 json.dumps({"error": "Route must have at least 2 points"})
             )
+        if len(route_points) > settings.MAX_ROUTE_POINTS:
+            return HttpResponseBadRequest(
+                json.dumps({"error": f"Route must have at most {settings.MAX_ROUTE_POINTS} points"})
+            )
 
         # Determine decision points on the route by taking the last point of each segments and use the according coordinates based on the index
 
@@ -312,6 +584,10 @@ class MatchLandmarksResource(View):
 
         if not instructions:
             return HttpResponseBadRequest(json.dumps({"error": "No instructions data"}))
+        if len(instructions) > settings.MAX_INSTRUCTIONS:
+            return HttpResponseBadRequest(
+                json.dumps({"error": f"Route must have at most {settings.MAX_INSTRUCTIONS} instructions"})
+            )
 
         timestamp_before = time.time()
 
@@ -320,6 +596,9 @@ class MatchLandmarksResource(View):
 
         # Don't use last element as it is the destination, therefore it has the same interval as the previous element
         for segment in instructions[:-1]:
+            if deadline.expired():
+                return service_unavailable("Request took too long.")
+
             # Get the last index of the interval and determine the associated coordinates
             segment_index: int = segment["interval"][0]
             coord: dict = route_points[segment_index]
@@ -332,9 +611,10 @@ class MatchLandmarksResource(View):
             # if landmark found, add it to the text of the graphhopper request
             # if no landmark found, keep the instruction as it is
             if landmark:
-                landmark["direction"] = determine_direction_landmark(
-                    segment_index, route_points, landmark
-                )
+                with span("direction"):
+                    landmark["direction"] = determine_direction_landmark(
+                        segment_index, route_points, landmark
+                    )
                 text: str = ""
                 # wheather to replace the graphhopper query or extend it
                 if replace_graphhopper_query:
@@ -373,7 +653,8 @@ class MatchLandmarksResource(View):
             f"Statistics: {landmarks_found} landmarks found for {len(instructions[:-1])} segments"
         )
 
-        return JsonResponse(json_data)
+        with span("serialize"):
+            return JsonResponse(json_data)
 
 
 def match_landmark_to_decisionpoint(decision_point: Point) -> dict:
@@ -386,17 +667,18 @@ def match_landmark_to_decisionpoint(decision_point: Point) -> dict:
     TRESHOLD = 30
     TRESHOLD_LOW_PRIORITY: int = round(TRESHOLD * 0.5)
 
-    point_mercator = decision_point.transform(settings.METRICAL, clone=True)
+    # Distances in meters around the decision point
+    projection = LocalProjection(decision_point.x, decision_point.y)
 
     found_landmark = None
 
     # Check which landmark are within the threshold to the ecision point
-    for landmark in Landmark.objects.filter(
-        coordinate__distance_lt=(point_mercator, D(m=TRESHOLD))
-    ):
+    with span("query", "landmark"):
+        candidates = fetch("match_landmarks", [bytes(decision_point.wkb), TRESHOLD])
+    for landmark_id, name, category, landmark_type, tags, lon, lat in candidates:
         # Calculate the distance between the landmark and the decision point
-        landmark_mercator = landmark.coordinate.transform(settings.METRICAL, clone=True)
-        distance: float = point_mercator.distance(landmark_mercator)
+        ((x, y),) = projection.forward([(lon, lat)])
+        distance: float = math.hypot(x, y)
 
         # Sometimes the filter function above doesn't work correctly for some reason
         # and accepts distances above the threshold
@@ -405,11 +687,11 @@ def match_landmark_to_decisionpoint(decision_point: Point) -> dict:
             continue
 
         # Low priority landmarks are only considered if they are closer
-        if landmark.type in LOW_PRIORITY_TAGS:
+        if landmark_type in LOW_PRIORITY_TAGS:
             if distance > TRESHOLD_LOW_PRIORITY:
                 continue
         # Also check tags
-        for tag in landmark.tags:
+        for tag in tags:
             if tag in LOW_PRIORITY_TAGS:
                 if distance > TRESHOLD_LOW_PRIORITY:
                     continue
@@ -421,19 +703,21 @@ def match_landmark_to_decisionpoint(decision_point: Point) -> dict:
                 continue
 
         found_landmark = {
-            "id": landmark.id,
-            "name": landmark.name,
-            "category": landmark.category,
-            "type": landmark.type,
-            "lat": landmark.coordinate.y,
-            "lon": landmark.coordinate.x,
+            "id": landmark_id,
+            "name": name,
+            "category": category,
+            "type": landmark_type,
+            "lat": lat,
+            "lon": lon,
             "distance": distance,
-            "osm_tags": json.loads(landmark.tags),
+            # Only decode the tags of the landmark that is returned
+            "osm_tags": tags,
         }
 
     # If it enough to keep the distance with 4 decimal places
     if found_landmark:
         found_landmark["distance"] = round(found_landmark["distance"], 4)
+        found_landmark["osm_tags"] = json.loads(found_landmark["osm_tags"])
 
     return found_landmark
 
@@ -7,6 +7,9 @@
 
 echo "Preheating the docker image..."
 
+# The import commands write their stage timings and memory use here, to compare builds
+IMPORT_REPORT_DIR=${IMPORT_REPORT_DIR:-import-reports}
+
 # Run postgres in the background
 ./run-postgres.sh
 
@@ -27,7 +30,7 @@ if [ $ret -ne 0 ]; then
     exit $ret
 fi
 
-poetry run python backend/manage.py import_constructions ${LOCATION}
+poetry run python backend/manage.py import_constructions ${LOCATION} --max-line-length 250 --report ${IMPORT_REPORT_DIR}/constructions.json
 
 # Check if previous command failed. If it did, exit
 ret=$?
@@ -36,7 +39,7 @@ if [ $ret -ne 0 ]; then
     exit $ret
 fi
 
-poetry run python backend/manage.py import_accident_hotspots ${LOCATION}
+poetry run python backend/manage.py import_accident_hotspots ${LOCATION} --report ${IMPORT_REPORT_DIR}/accident-hotspots.json
 
 # Check if previous command failed. If it did, exit
 ret=$?
@@ -45,7 +48,7 @@ if [ $ret -ne 0 ]; then
     exit $ret
 fi
 
-poetry run python backend/manage.py import_green_waves ${LOCATION}
+poetry run python backend/manage.py import_green_waves ${LOCATION} --report ${IMPORT_REPORT_DIR}/green-waves.json
 
 # Check if previous command failed. If it did, exit
 ret=$?
@@ -54,7 +57,7 @@ if [ $ret -ne 0 ]; then
     exit $ret
 fi
 
-poetry run python backend/manage.py import_velo_routes ${LOCATION}
+poetry run python backend/manage.py import_velo_routes ${LOCATION} --max-line-length 250 --report ${IMPORT_REPORT_DIR}/velo-routes.json
 
 # Check if previous command failed. If it did, exit
 ret=$?
@@ -63,7 +66,7 @@ if [ $ret -ne 0 ]; then
     exit $ret
 fi
 
-poetry run python backend/manage.py import_landmarks ${LOCATION}
+poetry run python backend/manage.py import_landmarks ${LOCATION} --report ${IMPORT_REPORT_DIR}/landmarks.json
 
 # Check if previous command failed. If it did, exit
 ret=$?
@@ -72,6 +75,28 @@ if [ $ret -ne 0 ]; then
     exit $ret
 fi
 
+# Snap the imported POIs onto the edges of the routing graph, if they are given
+if [ -n "${EDGES_FILE}" ]; then
+    poetry run python backend/manage.py import_edges ${EDGES_FILE} --report ${IMPORT_REPORT_DIR}/edges.json
+
+    # Check if previous command failed. If it did, exit
+    ret=$?
+    if [ $ret -ne 0 ]; then
+        echo "Failed to load the edges."
+        exit $ret
+    fi
+fi
+
+# Reorder the imported rows on disk along their spatial indexes
+poetry run python backend/manage.py cluster_pois --report ${IMPORT_REPORT_DIR}/cluster.json
+
+# Check if previous command failed. If it did, exit
+ret=$?
+if [ $ret -ne 0 ]; then
+    echo "Failed to cluster the POI tables."
+    exit $ret
+fi
+
 echo "Timestamp:"
 echo $(date)
 
@@ -3,6 +3,6 @@
 # Run postgres in the background
 ./run-postgres.sh
 
-# Run gunicorn
+# Run gunicorn, see backend/gunicorn.conf.py for the configuration options
 cd backend
-poetry run gunicorn backend.wsgi:application --workers 4 --bind 0.0.0.0:8000
\ No newline at end of file
+poetry run gunicorn --config gunicorn.conf.py